@@ -1,19 +1,35 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from pydantic import TypeAdapter
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from datetime import datetime, timedelta, timezone
 import logging
 
 import src.models as models
 import src.schemas as schemas
 from src.database import engine, get_db
-
-models.Base.metadata.create_all(bind=engine)
+from src.filter_options import FilterOptionsCache
+from src.pagination import decode_cursor, encode_cursor, keyset_conditions
+from src.response_cache import CARS_CACHE_TTL, REDIS_URL, ResponseCache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Encar Парсер", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with engine.begin() as connection:
+        await connection.run_sync(models.Base.metadata.create_all)
+    yield
+    await cars_cache.close()
+    await engine.dispose()
+
+app = FastAPI(title="Encar Парсер", version="1.0.0", lifespan=lifespan)
+
+filter_options = FilterOptionsCache()
+cars_cache = ResponseCache(REDIS_URL, CARS_CACHE_TTL)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,14 +37,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Encar Парсер API"}
 
+CAR_SUMMARIES = TypeAdapter(List[schemas.CarSummary])
+
+# Must stay identical to SEARCH_DOCUMENT in parser/database.py, which
+# creates the trigram index over it.
+SEARCH_DOCUMENT = literal_column(
+    "(coalesce(manufacturer, '') || ' ' || coalesce(model, '') || ' ' || coalesce(badge, ''))"
+)
+
+def text_filter(column, value, exact_values):
+    # Values from the filter options match exactly and use the B-tree
+    # index; anything else is a substring search on the trigram index.
+    exact = exact_values.get(value)
+    if exact is not None:
+        return column == exact
+    return column.ilike(f"%{value}%")
+
+def normalized_text(value):
+    # Text filters match case-insensitively, so case and surrounding
+    # whitespace do not change the result and are dropped from cache keys.
+    value = (value or "").strip().lower()
+    return value or None
+
 @app.get("/cars", response_model=List[schemas.CarSummary])
-def get_cars(
+async def get_cars(
     manufacturer: Optional[str] = Query(None),
     fuel_type: Optional[str] = Query(None),
     transmission: Optional[str] = Query(None),
@@ -41,109 +80,160 @@ def get_cars(
     sort_order: Optional[str] = Query("asc"),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
 ):
-    query = db.query(models.Car).filter(models.Car.is_active == True)
+    valid_sort_fields = {
+        "id": models.Car.id,
+        "price": models.Car.price,
+        "year": models.Car.year,
+        "manufacturer": models.Car.manufacturer
+    }
+    
+    manufacturer = normalized_text(manufacturer)
+    fuel_type = normalized_text(fuel_type)
+    transmission = normalized_text(transmission)
+    office_city_state = normalized_text(office_city_state)
+    sort_by = sort_by if sort_by in valid_sort_fields else "id"
+    descending = (sort_order or "").lower() == "desc"
+    
+    cache_key = await cars_cache.key({
+        "manufacturer": manufacturer,
+        "fuel_type": fuel_type,
+        "transmission": transmission,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_year": min_year,
+        "max_year": max_year,
+        "office_city_state": office_city_state,
+        "sort_by": sort_by,
+        "descending": descending,
+        "limit": limit,
+        "offset": 0 if cursor else offset,
+        "cursor": cursor or None,
+    })
+    cached = await cars_cache.get(cache_key)
+    if cached is not None:
+        body, headers = cached
+        return Response(content=body, media_type="application/json", headers=headers)
+    
+    await filter_options.get(db)
+    exact_values = filter_options.exact_values
+    query = select(models.Car).where(models.Car.is_active == True)
     
     if manufacturer:
-        query = query.filter(models.Car.manufacturer.ilike(f"%{manufacturer}%"))
+        query = query.where(text_filter(models.Car.manufacturer, manufacturer, exact_values["manufacturers"]))
     if fuel_type:
-        query = query.filter(models.Car.fuel_type.ilike(f"%{fuel_type}%"))
+        query = query.where(text_filter(models.Car.fuel_type, fuel_type, exact_values["fuel_types"]))
     if transmission:
-        query = query.filter(models.Car.transmission.ilike(f"%{transmission}%"))
+        query = query.where(text_filter(models.Car.transmission, transmission, exact_values["transmissions"]))
     if min_price is not None:
-        query = query.filter(models.Car.price >= min_price)
+        query = query.where(models.Car.price >= min_price)
     if max_price is not None:
-        query = query.filter(models.Car.price <= max_price)
+        query = query.where(models.Car.price <= max_price)
     if min_year is not None:
-        query = query.filter(models.Car.year >= min_year)
+        query = query.where(models.Car.year >= min_year)
     if max_year is not None:
-        query = query.filter(models.Car.year <= max_year)
+        query = query.where(models.Car.year <= max_year)
     if office_city_state:
-        query = query.filter(models.Car.office_city_state.ilike(f"%{office_city_state}%"))
+        query = query.where(text_filter(models.Car.office_city_state, office_city_state, exact_values["cities"]))
 
-    valid_sort_fields = {
-        "id": models.Car.id,
-        "price": models.Car.price,
-        "year": models.Car.year,
-        "manufacturer": models.Car.manufacturer
-    }
-    
-    sort_field = valid_sort_fields.get(sort_by, models.Car.id)
+    sort_field = valid_sort_fields[sort_by]
     
-    if sort_order.lower() == "desc":
+    if descending:
         query = query.order_by(sort_field.desc(), models.Car.id.desc())
     else:
         query = query.order_by(sort_field.asc(), models.Car.id.asc())
 
-    cars = query.offset(offset).limit(limit).all()
-    return cars
+    # A cursor continues after the last row of the previous page, so deep
+    # pages cost the same as the first; offset is kept for older clients.
+    if cursor:
+        try:
+            sort_value, car_id = decode_cursor(cursor, sort_by, descending)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        cars = []
+        for condition in keyset_conditions(sort_field, models.Car.id, descending, sort_value, car_id):
+            page = await db.scalars(query.where(condition).limit(limit - len(cars)))
+            cars.extend(page.all())
+            if len(cars) == limit:
+                break
+    else:
+        cars = (await db.scalars(query.offset(offset).limit(limit))).all()
+
+    headers = {}
+    if len(cars) == limit:
+        last_car = cars[-1]
+        headers["X-Next-Cursor"] = encode_cursor(
+            sort_by, descending, getattr(last_car, sort_by), last_car.id
+        )
+    
+    body = CAR_SUMMARIES.dump_json(CAR_SUMMARIES.validate_python(cars, from_attributes=True))
+    await cars_cache.set(cache_key, body, headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/cars/search", response_model=List[schemas.CarSummary])
+async def search_cars(
+    q: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    # "%>" is pg_trgm's word similarity of q against the document, which
+    # the trigram index over SEARCH_DOCUMENT can answer.
+    rank = func.word_similarity(q, SEARCH_DOCUMENT)
+    cars = await db.scalars(
+        select(models.Car)
+        .where(models.Car.is_active == True, SEARCH_DOCUMENT.op("%>")(q))
+        .order_by(rank.desc(), models.Car.id.asc())
+        .limit(limit)
+    )
+    return cars.all()
 
 @app.get("/cars/{car_id}", response_model=schemas.Car)
-def get_car(car_id: int, db: Session = Depends(get_db)):
-    car = db.query(models.Car).filter(
+async def get_car(car_id: int, db: AsyncSession = Depends(get_db)):
+    car = await db.scalar(select(models.Car).where(
         models.Car.id == car_id,
         models.Car.is_active == True
-    ).first()
+    ))
     
     if car is None:
         raise HTTPException(status_code=404, detail="Car not found")
     
     return car
 
-@app.get("/cars/filters/options")
-def get_filter_options(db: Session = Depends(get_db)):
-    manufacturers = db.query(models.Car.manufacturer).distinct().filter(
-        models.Car.manufacturer.isnot(None),
-        models.Car.is_active == True
-    ).all()
-    
-    fuel_types = db.query(models.Car.fuel_type).distinct().filter(
-        models.Car.fuel_type.isnot(None),
-        models.Car.is_active == True
-    ).all()
-    
-    transmissions = db.query(models.Car.transmission).distinct().filter(
-        models.Car.transmission.isnot(None),
-        models.Car.is_active == True
-    ).all()
-    
-    cities = db.query(models.Car.office_city_state).distinct().filter(
-        models.Car.office_city_state.isnot(None),
-        models.Car.is_active == True
-    ).all()
-    
-    from sqlalchemy import func
-    price_range = db.query(
-        func.min(models.Car.price),
-        func.max(models.Car.price)
-    ).filter(
-        models.Car.price.isnot(None),
-        models.Car.is_active == True
-    ).first()
+def naive_utc(value):
+    # recorded_at is TIMESTAMP WITHOUT TIME ZONE in UTC; asyncpg refuses to
+    # compare it with an aware datetime.
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+@app.get("/cars/{car_id}/history", response_model=List[schemas.CarHistoryEntry])
+async def get_car_history(
+    car_id: int,
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    if await db.scalar(select(models.Car.id).where(models.Car.id == car_id)) is None:
+        raise HTTPException(status_code=404, detail="Car not found")
     
-    year_range = db.query(
-        func.min(models.Car.year),
-        func.max(models.Car.year)
-    ).filter(
-        models.Car.year.isnot(None),
-        models.Car.is_active == True
-    ).first()
+    # Bounding recorded_at lets Postgres prune car_history to the months
+    # in range; without "since" the last year is returned.
+    until = naive_utc(until) or datetime.now(timezone.utc).replace(tzinfo=None)
+    since = naive_utc(since) or until - timedelta(days=365)
     
-    return {
-        "manufacturers": [m[0] for m in manufacturers if m[0]],
-        "fuel_types": [f[0] for f in fuel_types if f[0]],
-        "transmissions": [t[0] for t in transmissions if t[0]],
-        "cities": [c[0] for c in cities if c[0]],
-        "price_range": {
-            "min": price_range[0] if price_range[0] else 0,
-            "max": price_range[1] if price_range[1] else 0
-        },
-        "year_range": {
-            "min": int(year_range[0]) if year_range[0] else 2000,
-            "max": int(year_range[1]) if year_range[1] else 2025
-        }
-    }
+    history = await db.scalars(select(models.CarHistory).where(
+        models.CarHistory.car_id == car_id,
+        models.CarHistory.recorded_at >= since,
+        models.CarHistory.recorded_at <= until
+    ).order_by(models.CarHistory.recorded_at.asc()))
+    return history.all()
+
+@app.get("/cars/filters/options")
+async def get_filter_options(db: AsyncSession = Depends(get_db)):
+    return await filter_options.get(db)
 
 if __name__ == "__main__":
     import uvicorn
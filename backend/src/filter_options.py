@@ -0,0 +1,92 @@
+import asyncio
+import logging
+
+from sqlalchemy import func, select
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+FACET_COLUMNS = {
+    "manufacturers": models.Car.manufacturer,
+    "fuel_types": models.Car.fuel_type,
+    "transmissions": models.Car.transmission,
+    "cities": models.Car.office_city_state,
+}
+
+async def latest_session_id(db):
+    return await db.scalar(
+        select(models.ParseSession.session_id)
+        .where(models.ParseSession.status == "completed")
+        .order_by(models.ParseSession.completed_at.desc())
+        .limit(1)
+    )
+
+async def compute_filter_options(db):
+    options = {}
+    counts = {}
+    for key, column in FACET_COLUMNS.items():
+        rows = await db.execute(
+            select(column, func.count())
+            .where(column.isnot(None), column != "", models.Car.is_active == True)
+            .group_by(column)
+            .order_by(column)
+        )
+        counts[key] = dict(rows.all())
+        options[key] = list(counts[key])
+
+    min_price, max_price, min_year, max_year = (await db.execute(
+        select(
+            func.min(models.Car.price),
+            func.max(models.Car.price),
+            func.min(models.Car.year),
+            func.max(models.Car.year)
+        ).where(models.Car.is_active == True)
+    )).one()
+
+    return {
+        **options,
+        "price_range": {
+            "min": min_price if min_price else 0,
+            "max": max_price if max_price else 0
+        },
+        "year_range": {
+            "min": int(min_year) if min_year else 2000,
+            "max": int(max_year) if max_year else 2025
+        },
+        "counts": counts
+    }
+
+class FilterOptionsCache:
+    """Filter options of the latest completed parse session.
+
+    Cars only change when a parse session completes, so the options are
+    computed once per session and served from memory until the next one.
+    Each request costs a single lookup on ``parse_sessions``.
+
+    ``exact_values`` maps the lowercased values of each facet to their
+    stored spelling, so filters picked from the options can be matched with
+    equality instead of a substring search.
+    """
+
+    def __init__(self):
+        self.session_id = None
+        self.options = None
+        self.exact_values = {key: {} for key in FACET_COLUMNS}
+        self._lock = asyncio.Lock()
+
+    async def get(self, db):
+        session_id = await latest_session_id(db)
+        if self.options is not None and session_id == self.session_id:
+            return self.options
+
+        async with self._lock:
+            if self.options is None or session_id != self.session_id:
+                self.options = await compute_filter_options(db)
+                self.exact_values = {
+                    key: {value.lower(): value for value in self.options[key]}
+                    for key in FACET_COLUMNS
+                }
+                self.session_id = session_id
+                logger.info(f"Computed filter options for parse session {session_id}")
+        return self.options
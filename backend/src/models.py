@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, DateTime, Identity, Index, func
 from sqlalchemy.dialects.postgresql import JSON
 import datetime
 from .database import Base
@@ -7,7 +7,7 @@ class Car(Base):
     __tablename__ = "cars"
     
     id = Column(Integer, primary_key=True, index=True)
-    encar_id = Column(String, index=True)
+    encar_id = Column(String, unique=True, index=True)
     manufacturer = Column(String)
     model = Column(String)
     badge = Column(String)
@@ -39,3 +39,44 @@ class Car(Base):
     updated_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
     last_seen_at = Column(DateTime)
     is_active = Column(Boolean, default=True)
+
+class CarHistory(Base):
+    __tablename__ = "car_history"
+    __table_args__ = (
+        Index("ix_car_history_car_id_recorded_at", "car_id", "recorded_at"),
+        {"postgresql_partition_by": "RANGE (recorded_at)"},
+    )
+    
+    # Same defaults as parser/models.py: whichever service starts first
+    # creates the table, and the parser's inserts rely on them.
+    id = Column(BigInteger, Identity(), primary_key=True)
+    recorded_at = Column(DateTime, primary_key=True, server_default=func.now())
+    car_id = Column(Integer, nullable=False)
+    encar_id = Column(String, nullable=False)
+    session_id = Column(String)
+    event = Column(String, nullable=False)
+    price = Column(Float)
+    mileage = Column(Float)
+    sales_status = Column(String)
+    modified_date = Column(DateTime)
+
+class ParseSession(Base):
+    __tablename__ = "parse_sessions"
+    
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, unique=True, nullable=False)
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
+    status = Column(String)
+    mode = Column(String)
+    total_cars_found = Column(Integer)
+    new_cars_added = Column(Integer)
+    cars_updated = Column(Integer)
+    cars_removed = Column(Integer)
+    error_message = Column(String)
+    dead_letter_pages = Column(JSON)
+    telemetry = Column(JSON)
+    max_modified_date = Column(DateTime)
+    ingest_stage = Column(String)
+    ingest_cursor = Column(String)
+    ingest_chunks = Column(Integer)
@@ -0,0 +1,62 @@
+import base64
+import binascii
+import json
+
+from sqlalchemy import and_, tuple_
+
+# Types a cursor's sort value may have per sort field; None stands for a
+# NULL sort value. Anything else would only fail once it reaches Postgres.
+SORT_VALUE_TYPES = {
+    "id": (int,),
+    "price": (int, float, type(None)),
+    "year": (int, float, type(None)),
+    "manufacturer": (str, type(None)),
+}
+
+def valid_sort_value(sort_by, value):
+    return not isinstance(value, bool) and isinstance(value, SORT_VALUE_TYPES.get(sort_by, ()))
+
+def encode_cursor(sort_by, descending, sort_value, car_id):
+    payload = json.dumps([sort_by, descending, sort_value, car_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor, sort_by, descending):
+    """Returns the ``(sort_value, id)`` of the last row of the previous page.
+
+    Raises ``ValueError`` for a cursor that is malformed, holds values of
+    the wrong type for the sort, or was issued for another sort.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort_by, cursor_descending, sort_value, car_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if (cursor_sort_by, cursor_descending) != (sort_by, descending):
+        raise ValueError("Cursor does not match the requested sort")
+    # cars.id is a 32-bit integer column.
+    if isinstance(car_id, bool) or not isinstance(car_id, int) or not 0 < car_id < 2 ** 31:
+        raise ValueError("Invalid cursor")
+    if not valid_sort_value(sort_by, sort_value):
+        raise ValueError("Invalid cursor")
+    return sort_value, car_id
+
+def keyset_conditions(sort_field, id_field, descending, sort_value, car_id):
+    """Conditions for the rows after ``(sort_value, car_id)``, one per
+    segment of the sort order.
+
+    Postgres sorts NULLs last ascending and first descending. The NULL
+    segment is kept apart from the row comparison so each condition stays a
+    single range of the ``(sort_field, id)`` index; callers query the
+    segments in order until the page is full.
+    """
+    if sort_field is id_field:
+        return [id_field < car_id if descending else id_field > car_id]
+
+    if descending:
+        if sort_value is None:
+            return [and_(sort_field.is_(None), id_field < car_id), sort_field.isnot(None)]
+        return [tuple_(sort_field, id_field) < (sort_value, car_id)]
+
+    if sort_value is None:
+        return [and_(sort_field.is_(None), id_field > car_id)]
+    return [tuple_(sort_field, id_field) > (sort_value, car_id), sort_field.is_(None)]
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import logging
+import os
+
+import redis
+from redis import asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CARS_CACHE_TTL = int(os.getenv("CARS_CACHE_TTL", "300"))
+
+# Bumped by the parser after it commits a parse session.
+GENERATION_KEY = "encar:cars:generation"
+
+class ResponseCache:
+    """Pre-serialized ``/cars`` responses kept in Redis.
+
+    Keys embed the generation counter the parser bumps after every parse
+    session it commits, so a new crawl makes all entries of the previous
+    one unreachable at once and the TTL clears them out. If Redis is
+    unavailable the cache is skipped and requests go to Postgres.
+    """
+
+    def __init__(self, url, ttl, prefix="encar:cars:response"):
+        self.client = aioredis.Redis.from_url(url) if ttl else None
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def key(self, params):
+        """Cache key for the normalized request ``params`` under the current
+        generation, or ``None`` when the cache is off or unreachable."""
+        if self.client is None:
+            return None
+        try:
+            generation = int(await self.client.get(GENERATION_KEY) or 0)
+        except redis.RedisError as e:
+            logger.warning(f"Response cache unavailable: {e}")
+            return None
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{generation}:{digest}"
+
+    async def get(self, key):
+        """Returns ``(body, headers)`` stored under ``key``, or ``None``."""
+        if key is None:
+            return None
+        try:
+            entry = await self.client.hgetall(key)
+        except redis.RedisError as e:
+            logger.warning(f"Response cache read failed: {e}")
+            return None
+        if not entry:
+            return None
+        headers = json.loads(entry[b"headers"])
+        return entry[b"body"], headers
+
+    async def set(self, key, body, headers):
+        if key is None:
+            return
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            pipe.hset(key, mapping={"body": body, "headers": json.dumps(headers)})
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Response cache write failed: {e}")
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
@@ -60,6 +60,18 @@ class CarSummary(BaseModel):
     class Config:
         from_attributes = True
 
+class CarHistoryEntry(BaseModel):
+    recorded_at: datetime
+    event: str
+    session_id: Optional[str] = None
+    price: Optional[float] = None
+    mileage: Optional[float] = None
+    sales_status: Optional[str] = None
+    modified_date: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
 class CarFilters(BaseModel):
     manufacturer: Optional[str] = None
     fuel_type: Optional[str] = None
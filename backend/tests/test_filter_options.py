@@ -0,0 +1,71 @@
+import asyncio
+
+from src import filter_options
+from src.filter_options import FilterOptionsCache
+
+
+def options(*manufacturers):
+    return {
+        "manufacturers": list(manufacturers),
+        "fuel_types": ["가솔린"],
+        "transmissions": ["오토"],
+        "cities": [],
+    }
+
+
+def fake_database(monkeypatch, session_ids, computed):
+    """Serves ``session_ids`` in turn as the latest completed session and
+    ``computed`` in turn as the options computed for it."""
+    session_ids = iter(session_ids)
+    computed = iter(computed)
+    calls = []
+
+    async def latest_session_id(db):
+        return next(session_ids)
+
+    async def compute_filter_options(db):
+        calls.append(db)
+        await asyncio.sleep(0)
+        return next(computed)
+
+    monkeypatch.setattr(filter_options, "latest_session_id", latest_session_id)
+    monkeypatch.setattr(filter_options, "compute_filter_options", compute_filter_options)
+    return calls
+
+
+def test_options_are_computed_once_per_session(monkeypatch):
+    calls = fake_database(monkeypatch, ["a", "a", "b"], [options("Kia"), options("BMW")])
+    cache = FilterOptionsCache()
+
+    async def run():
+        return [await cache.get(None) for _ in range(3)]
+
+    first, second, third = asyncio.run(run())
+
+    assert len(calls) == 2
+    assert first is second
+    assert third["manufacturers"] == ["BMW"]
+    assert cache.session_id == "b"
+
+
+def test_exact_values_map_lowercased_values_to_stored_spelling(monkeypatch):
+    fake_database(monkeypatch, ["a"], [options("Kia", "Mercedes-Benz")])
+    cache = FilterOptionsCache()
+
+    asyncio.run(cache.get(None))
+
+    assert cache.exact_values["manufacturers"] == {"kia": "Kia", "mercedes-benz": "Mercedes-Benz"}
+    assert cache.exact_values["cities"] == {}
+
+
+def test_concurrent_requests_compute_the_options_once(monkeypatch):
+    calls = fake_database(monkeypatch, ["a"] * 5, [options("Kia")])
+    cache = FilterOptionsCache()
+
+    async def run():
+        return await asyncio.gather(*[cache.get(None) for _ in range(5)])
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
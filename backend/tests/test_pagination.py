@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.models import Car
+from src.pagination import decode_cursor, encode_cursor, keyset_conditions
+
+
+def compile_all(conditions):
+    return [
+        str(condition.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        for condition in conditions
+    ]
+
+
+def test_id_sort_has_a_single_segment():
+    assert compile_all(keyset_conditions(Car.id, Car.id, False, 7, 7)) == ["cars.id > 7"]
+    assert compile_all(keyset_conditions(Car.id, Car.id, True, 7, 7)) == ["cars.id < 7"]
+
+
+def test_ascending_non_null_continues_into_the_null_segment():
+    assert compile_all(keyset_conditions(Car.price, Car.id, False, 1500, 7)) == [
+        "(cars.price, cars.id) > (1500, 7)",
+        "cars.price IS NULL",
+    ]
+
+
+def test_ascending_null_stays_in_the_null_segment():
+    assert compile_all(keyset_conditions(Car.price, Car.id, False, None, 7)) == [
+        "cars.price IS NULL AND cars.id > 7",
+    ]
+
+
+def test_descending_null_continues_into_the_non_null_segment():
+    assert compile_all(keyset_conditions(Car.price, Car.id, True, None, 7)) == [
+        "cars.price IS NULL AND cars.id < 7",
+        "cars.price IS NOT NULL",
+    ]
+
+
+def test_descending_non_null_stays_in_the_non_null_segment():
+    assert compile_all(keyset_conditions(Car.price, Car.id, True, 1500, 7)) == [
+        "(cars.price, cars.id) < (1500, 7)",
+    ]
+
+
+@pytest.mark.parametrize(
+    "sort_by, descending, sort_value",
+    [("id", False, 42), ("price", True, 1500), ("price", False, None), ("manufacturer", False, "기아")],
+)
+def test_cursor_round_trip(sort_by, descending, sort_value):
+    cursor = encode_cursor(sort_by, descending, sort_value, 42)
+
+    assert decode_cursor(cursor, sort_by, descending) == (sort_value, 42)
+
+
+def test_cursor_for_another_sort_is_rejected():
+    cursor = encode_cursor("price", False, 1500, 42)
+
+    with pytest.raises(ValueError, match="does not match"):
+        decode_cursor(cursor, "price", True)
+
+
+@pytest.mark.parametrize(
+    "sort_by, sort_value, car_id",
+    [
+        ("price", "1500", 42),
+        ("price", True, 42),
+        ("manufacturer", 5, 42),
+        ("id", None, 42),
+        ("price", 1500, "42"),
+        ("price", 1500, 2 ** 31),
+        ("price", 1500, 0),
+    ],
+)
+def test_cursor_with_wrong_types_is_rejected(sort_by, sort_value, car_id):
+    cursor = encode_cursor(sort_by, False, sort_value, car_id)
+
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor, sort_by, False)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor("price", False, 1500, 42)[:-3]])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor, "price", False)
@@ -0,0 +1,70 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from src.response_cache import GENERATION_KEY, ResponseCache
+
+
+@pytest.fixture
+def cache():
+    response_cache = ResponseCache("redis://localhost", ttl=60)
+    response_cache.client = fakeredis.aioredis.FakeRedis()
+    return response_cache
+
+
+def test_key_does_not_depend_on_param_order(cache):
+    async def run():
+        return await cache.key({"page": 1, "sort": "price"}), await cache.key({"sort": "price", "page": 1})
+
+    first, second = asyncio.run(run())
+
+    assert first == second
+    assert first.startswith("encar:cars:response:0:")
+
+
+def test_bumping_the_generation_changes_every_key(cache):
+    async def run():
+        before = await cache.key({"page": 1})
+        await cache.set(before, b"[]", {"X-Total-Count": "0"})
+        await cache.client.incr(GENERATION_KEY)
+        after = await cache.key({"page": 1})
+        return before, after, await cache.get(after)
+
+    before, after, cached = asyncio.run(run())
+
+    assert after != before
+    assert after.startswith("encar:cars:response:1:")
+    assert cached is None
+
+
+def test_set_and_get_round_trip_with_ttl(cache):
+    async def run():
+        key = await cache.key({"page": 2})
+        await cache.set(key, b'{"cars": []}', {"X-Total-Count": "40"})
+        return await cache.get(key), await cache.client.ttl(key)
+
+    cached, ttl = asyncio.run(run())
+
+    assert cached == (b'{"cars": []}', {"X-Total-Count": "40"})
+    assert 0 < ttl <= 60
+
+
+def test_zero_ttl_disables_the_cache():
+    cache = ResponseCache("redis://localhost", ttl=0)
+
+    async def run():
+        key = await cache.key({"page": 1})
+        await cache.set(key, b"[]", {})
+        return key, await cache.get(key)
+
+    assert asyncio.run(run()) == (None, None)
+    assert cache.client is None
+
+
+def test_unreachable_redis_skips_the_cache(cache):
+    server = fakeredis.FakeServer()
+    server.connected = False
+    cache.client = fakeredis.aioredis.FakeRedis(server=server)
+
+    assert asyncio.run(cache.key({"page": 1})) is None
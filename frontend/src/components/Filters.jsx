@@ -33,6 +33,11 @@ const Filters = ({ onFiltersChange, currentFilters }) => {
     onFiltersChange(newFilters);
   };
 
+  const optionLabel = (group, value) => {
+    const count = filterOptions.counts?.[group]?.[value];
+    return count ? `${value} (${count})` : value;
+  };
+
   const clearFilters = () => {
     const emptyFilters = {};
     setLocalFilters(emptyFilters);
@@ -57,7 +62,7 @@ const Filters = ({ onFiltersChange, currentFilters }) => {
           <option value="">Все бренды</option>
           {filterOptions.manufacturers.map(manufacturer => (
             <option key={manufacturer} value={manufacturer}>
-              {manufacturer}
+              {optionLabel('manufacturers', manufacturer)}
             </option>
           ))}
         </select>
@@ -72,7 +77,7 @@ const Filters = ({ onFiltersChange, currentFilters }) => {
           <option value="">Все типы</option>
           {filterOptions.fuel_types.map(fuel => (
             <option key={fuel} value={fuel}>
-              {fuel}
+              {optionLabel('fuel_types', fuel)}
             </option>
           ))}
         </select>
@@ -87,7 +92,7 @@ const Filters = ({ onFiltersChange, currentFilters }) => {
           <option value="">Все типы</option>
           {filterOptions.transmissions.map(transmission => (
             <option key={transmission} value={transmission}>
-              {transmission}
+              {optionLabel('transmissions', transmission)}
             </option>
           ))}
         </select>
@@ -102,7 +107,7 @@ const Filters = ({ onFiltersChange, currentFilters }) => {
           <option value="">Все города</option>
           {filterOptions.cities.map(city => (
             <option key={city} value={city}>
-              {city}
+              {optionLabel('cities', city)}
             </option>
           ))}
         </select>
@@ -10,21 +10,21 @@ const CarList = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [filters, setFilters] = useState({});
-  const [hasMore, setHasMore] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
   const [sort, setSort] = useState({ sortBy: 'id', sortOrder: 'asc' });
 
   useEffect(() => {
     loadCars();
   }, [filters, sort]);
 
-  const loadCars = async (offset = 0) => {
+  const loadCars = async (cursor = null) => {
     try {
       setLoading(true);
       const response = await carService.getCars({
         ...filters,
         sort_by: sort.sortBy,
         sort_order: sort.sortOrder,
-        offset,
+        cursor,
         limit: 20
       });
 
@@ -46,18 +46,18 @@ const CarList = () => {
 
       console.log('Processed cars data:', carsData);
 
-      if (offset === 0) {
+      if (cursor === null) {
         setCars(carsData);
       } else {
         setCars(prev => [...prev, ...carsData]);
       }
 
-      setHasMore(carsData.length === 20);
+      setNextCursor(response?.nextCursor ?? null);
       setError(null);
     } catch (err) {
       setError('Не удалось загрузить список автомобилей.');
       console.error('Error loading cars:', err);
-      if (offset === 0) {
+      if (cursor === null) {
         setCars([]);
       }
     } finally {
@@ -66,8 +66,8 @@ const CarList = () => {
   };
 
   const loadMore = () => {
-    if (!loading && hasMore) {
-      loadCars(cars.length);
+    if (!loading && nextCursor) {
+      loadCars(nextCursor);
     }
   };
 
@@ -123,7 +123,7 @@ const CarList = () => {
                   </div>
                 )}
 
-                {hasMore && Array.isArray(cars) && cars.length > 0 && (
+                {nextCursor && Array.isArray(cars) && cars.length > 0 && (
                   <div className="load-more">
                     <button
                       onClick={loadMore}
@@ -47,7 +47,10 @@ export const carService = {
     
     try {
       const response = await api.get(`/cars?${params.toString()}`);
-      return response.data;
+      return {
+        cars: response.data,
+        nextCursor: response.headers['x-next-cursor'] || null,
+      };
     } catch (error) {
       console.error('Failed to fetch cars:', error);
       throw new Error('Failed to load car listings');
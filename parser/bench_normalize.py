@@ -0,0 +1,136 @@
+"""Micro-benchmark for listing normalization.
+
+Compares the per-listing cost of the previous dict-based normalizer with
+``records.normalize_car`` on synthetic search results:
+
+    python bench_normalize.py [listings] [repeat]
+"""
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+from records import normalize_car, parse_modified_date
+
+
+def legacy_normalize_car_data(car_data):
+    normalized = {
+        "encar_id": str(car_data.get("Id", "")),
+        "manufacturer": car_data.get("Manufacturer", ""),
+        "model": car_data.get("Model", ""),
+        "badge": car_data.get("Badge", ""),
+        "badge_detail": car_data.get("BadgeDetail", ""),
+        "transmission": car_data.get("Transmission", ""),
+        "fuel_type": car_data.get("FuelType", ""),
+        "year": car_data.get("Year"),
+        "form_year": car_data.get("FormYear", ""),
+        "mileage": car_data.get("Mileage"),
+        "price": car_data.get("Price"),
+        "separation": car_data.get("Separation", []),
+        "trust": car_data.get("Trust", []),
+        "service_mark": car_data.get("ServiceMark", []),
+        "condition": car_data.get("Condition", []),
+        "photo": car_data.get("Photo", ""),
+        "photos": car_data.get("Photos", []),
+        "service_copy_car": car_data.get("ServiceCopyCar", ""),
+        "sales_status": car_data.get("SalesStatus", ""),
+        "sell_type": car_data.get("SellType", ""),
+        "buy_type": car_data.get("BuyType", []),
+        "powerpack": car_data.get("Powerpack", ""),
+        "ad_words": car_data.get("AdWords", ""),
+        "hotmark": car_data.get("Hotmark", ""),
+        "office_city_state": car_data.get("OfficeCityState", ""),
+        "office_name": car_data.get("OfficeName", ""),
+        "dealer_name": car_data.get("DealerName", ""),
+    }
+
+    modified_date_str = car_data.get("ModifiedDate", "")
+    if modified_date_str:
+        try:
+            if "+" in modified_date_str:
+                date_part = modified_date_str.split("+")[0].strip()
+            elif "-" in modified_date_str[-3:]:
+                date_part = modified_date_str.split("-")[:-1]
+                date_part = "-".join(date_part).strip()
+            else:
+                date_part = modified_date_str.strip()
+
+            if "." in date_part:
+                date_part = date_part.split(".")[0]
+
+            normalized["modified_date"] = datetime.strptime(date_part, "%Y-%m-%d %H:%M:%S")
+        except Exception:
+            normalized["modified_date"] = None
+    else:
+        normalized["modified_date"] = None
+
+    return normalized
+
+
+def make_listings(count, distinct_dates=2000):
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1)
+    dates = [
+        (start + timedelta(minutes=rng.randrange(500_000))).strftime("%Y-%m-%d %H:%M:%S.000 +09")
+        for _ in range(distinct_dates)
+    ]
+    return [
+        {
+            "Id": 30_000_000 + i,
+            "Manufacturer": rng.choice(["현대", "기아", "BMW", "벤츠"]),
+            "Model": "Model",
+            "Badge": "Badge",
+            "BadgeDetail": "",
+            "Transmission": "오토",
+            "FuelType": "가솔린",
+            "Year": 202001.0,
+            "FormYear": "2020",
+            "Mileage": float(rng.randrange(200_000)),
+            "Price": float(rng.randrange(100, 10_000)),
+            "Separation": ["A"],
+            "Trust": ["Warranty"],
+            "ServiceMark": [],
+            "Condition": ["Inspection", "Record"],
+            "Photo": f"/carpicture/{i}_",
+            "Photos": [{"code": "001", "path": f"/carpicture/{i}_001.jpg"}],
+            "ServiceCopyCar": "ORIGINAL",
+            "SalesStatus": "판매",
+            "SellType": "일반",
+            "BuyType": ["Delivery"],
+            "Powerpack": "",
+            "AdWords": "",
+            "Hotmark": "",
+            "OfficeCityState": "서울",
+            "OfficeName": "Office",
+            "DealerName": "Dealer",
+            "ModifiedDate": rng.choice(dates),
+        }
+        for i in range(count)
+    ]
+
+
+def per_listing_us(normalize, listings, repeat):
+    seconds = min(timeit.repeat(lambda: [normalize(car) for car in listings], number=1, repeat=repeat))
+    return seconds / len(listings) * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    listings = make_listings(count)
+
+    for car in listings[:100]:
+        assert normalize_car(car).as_dict() == legacy_normalize_car_data(car)
+
+    before = per_listing_us(legacy_normalize_car_data, listings, repeat)
+    parse_modified_date.cache_clear()
+    after = per_listing_us(normalize_car, listings, repeat)
+
+    print(f"{count} listings, best of {repeat}")
+    print(f"  before: {before:.2f} us/listing")
+    print(f"  after:  {after:.2f} us/listing ({before / after:.1f}x)")
+    print(f"  date cache: {parse_modified_date.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,10 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=7200,
     task_soft_time_limit=6600,
+    # Crawl tasks are acked late so a restarted worker gets them back and
+    # resumes from the checkpoint; the broker must not redeliver them while
+    # they are still running.
+    broker_transport_options={"visibility_timeout": 3 * 3600},
 )
 
 celery_app.conf.beat_schedule = {
@@ -25,4 +29,8 @@ celery_app.conf.beat_schedule = {
         "task": "tasks.parse_encar_data",
         "schedule": crontab(hour=21, minute=0),
     },
+    "parse-encar-delta-hourly": {
+        "task": "tasks.parse_encar_delta",
+        "schedule": crontab(minute=30),
+    },
 }
@@ -0,0 +1,105 @@
+import json
+import logging
+import zlib
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Set
+
+import redis
+from redis import asyncio as aioredis
+
+from records import record_from_dict
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ConfigProgress:
+    pages: Set[int] = field(default_factory=set)
+    total_count: int = None
+    max_pages: int = None
+    stopped: bool = False
+
+
+class CrawlCheckpoint:
+    """Page-level progress of one crawl kept in Redis.
+
+    Every processed page is appended to a list together with the cars it
+    contributed, so a run that is interrupted by the soft time limit or a
+    worker restart can replay what it already has and fetch only the pages
+    that are missing. The crawl plan is stored as well, because re-running
+    the facet partitioner could produce different configurations. All keys
+    expire ``ttl`` seconds after the last write.
+    """
+
+    def __init__(self, url, session_id, scope="full", ttl=86400):
+        self.client = aioredis.Redis.from_url(url)
+        self.plan_key, self.pages_key = checkpoint_keys(session_id, scope)
+        self.ttl = ttl
+
+    async def load_plan(self):
+        raw = await self.client.get(self.plan_key)
+        return json.loads(raw) if raw else None
+
+    async def save_plan(self, configs):
+        plan = json.dumps([asdict(crawl_config) for crawl_config in configs], ensure_ascii=False)
+        await self.client.set(self.plan_key, plan, ex=self.ttl)
+
+    async def record_page(self, state, page, batch):
+        entry = {
+            "config": state.config.name,
+            "page": page,
+            "total_count": state.total_count,
+            "max_pages": state.max_pages,
+            "stopped": state.stopped,
+            "cars": [car.as_dict() for car in batch],
+        }
+        blob = zlib.compress(json.dumps(entry, ensure_ascii=False, default=str).encode("utf-8"))
+        pipe = self.client.pipeline(transaction=False)
+        pipe.rpush(self.pages_key, blob)
+        pipe.expire(self.pages_key, self.ttl)
+        pipe.expire(self.plan_key, self.ttl)
+        await pipe.execute()
+
+    async def iter_pages(self, chunk_size=200):
+        start = 0
+        while True:
+            blobs = await self.client.lrange(self.pages_key, start, start + chunk_size - 1)
+            if not blobs:
+                return
+            for blob in blobs:
+                yield json.loads(zlib.decompress(blob))
+            start += len(blobs)
+
+    async def restore(self, progress: Dict[str, ConfigProgress]):
+        """Yields the cars of every checkpointed page as ``CarRecord`` batches
+        and fills ``progress`` with the pages done per config."""
+        pages = 0
+        async for entry in self.iter_pages():
+            pages += 1
+            config_progress = progress.setdefault(entry["config"], ConfigProgress())
+            config_progress.pages.add(entry["page"])
+            config_progress.total_count = entry["total_count"]
+            config_progress.max_pages = entry["max_pages"]
+            config_progress.stopped = config_progress.stopped or entry["stopped"]
+            if entry["cars"]:
+                yield [record_from_dict(car) for car in entry["cars"]]
+        if pages:
+            logger.info(f"Restored {pages} checkpointed pages from {len(progress)} configs")
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def checkpoint_keys(session_id, scope):
+    prefix = f"encar:crawl:{session_id}:{scope}"
+    return f"{prefix}:plan", f"{prefix}:pages"
+
+
+def drop_checkpoint(url, session_id, scope="full"):
+    client = redis.Redis.from_url(url)
+    try:
+        client.delete(*checkpoint_keys(session_id, scope))
+    except redis.RedisError as e:
+        logger.warning(f"Failed to drop checkpoint {scope} of session {session_id}: {e}")
+    finally:
+        client.close()
@@ -1,15 +1,97 @@
-from sqlalchemy import create_engine
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from contextlib import contextmanager
 from config import config
-from models import Base
+from models import KEYSET_SORT_COLUMNS, Base
 
 engine = create_engine(config.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+# Columns the backend filters with ILIKE '%value%', which only a trigram
+# index can serve.
+TRIGRAM_COLUMNS = ("manufacturer", "model", "badge", "fuel_type", "transmission", "office_city_state")
+
+# Document searched by the backend's /cars/search; the backend has to use
+# exactly this expression for the index to apply.
+SEARCH_DOCUMENT = "(coalesce(manufacturer, '') || ' ' || coalesce(model, '') || ' ' || coalesce(badge, ''))"
+
+
+SCHEMA_UPGRADES = [
+    # ON CONFLICT (encar_id) needs a unique index, which a cars table
+    # created by the backend did not have. Tables created from the models
+    # already get one as ix_cars_encar_id.
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+            WHERE i.indrelid = 'cars'::regclass AND i.indisunique AND i.indnatts = 1
+              AND i.indpred IS NULL AND a.attname = 'encar_id'
+        ) THEN
+            CREATE UNIQUE INDEX ux_cars_encar_id ON cars (encar_id);
+        END IF;
+    END $$
+    """,
+    "ALTER TABLE cars ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "ALTER TABLE cars ADD COLUMN IF NOT EXISTS missed_sessions INTEGER DEFAULT 0",
+    "ALTER TABLE parse_sessions ADD COLUMN IF NOT EXISTS dead_letter_pages JSON",
+    "ALTER TABLE parse_sessions ADD COLUMN IF NOT EXISTS mode VARCHAR(20) DEFAULT 'full'",
+    "ALTER TABLE parse_sessions ADD COLUMN IF NOT EXISTS max_modified_date TIMESTAMP",
+    "ALTER TABLE parse_sessions ADD COLUMN IF NOT EXISTS telemetry JSON",
+    # car_history created by the backend before it declared these defaults.
+    "ALTER TABLE car_history ALTER COLUMN recorded_at SET DEFAULT now()",
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'car_history' AND column_name = 'id'
+              AND (is_identity = 'YES' OR column_default IS NOT NULL)
+        ) THEN
+            CREATE SEQUENCE IF NOT EXISTS car_history_id_seq OWNED BY car_history.id;
+            ALTER TABLE car_history ALTER COLUMN id SET DEFAULT nextval('car_history_id_seq');
+        END IF;
+    END $$
+    """,
+    "ALTER TABLE parse_sessions ADD COLUMN IF NOT EXISTS ingest_stage VARCHAR(20)",
+    "ALTER TABLE parse_sessions ADD COLUMN IF NOT EXISTS ingest_cursor VARCHAR(100)",
+    "ALTER TABLE parse_sessions ADD COLUMN IF NOT EXISTS ingest_chunks INTEGER DEFAULT 0",
+    *[
+        f"CREATE INDEX IF NOT EXISTS ix_cars_active_{column}_id ON cars ({column}, id) WHERE is_active"
+        for column in KEYSET_SORT_COLUMNS
+    ],
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    *[
+        f"CREATE INDEX IF NOT EXISTS ix_cars_{column}_trgm ON cars USING gin ({column} gin_trgm_ops)"
+        for column in TRIGRAM_COLUMNS
+    ],
+    f"CREATE INDEX IF NOT EXISTS ix_cars_search_trgm ON cars USING gin ({SEARCH_DOCUMENT} gin_trgm_ops) WHERE is_active",
+]
+
+
+def ensure_history_partitions(connection, months_ahead=1):
+    """Creates the ``car_history`` partitions from this month up to
+    ``months_ahead`` months from now."""
+    month = date.today().replace(day=1)
+    for _ in range(months_ahead + 1):
+        next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS car_history_{month:%Y_%m} PARTITION OF car_history "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+        ))
+        month = next_month
+
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        for statement in SCHEMA_UPGRADES:
+            connection.execute(text(statement))
+        ensure_history_partitions(connection)
 
 
 @contextmanager
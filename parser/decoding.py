@@ -0,0 +1,66 @@
+import json
+import logging
+from typing import Any, List
+
+from records import CAR_FIELDS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if msgspec is not None:
+    # Only the fields normalize_car reads are declared; msgspec skips every
+    # other key of a listing without building Python objects for it.
+    Listing = msgspec.defstruct(
+        "Listing",
+        [(source, Any, default) for _, source, default in CAR_FIELDS]
+        + [("ModifiedDate", Any, None)],
+        frozen=True,
+        gc=False,
+    )
+
+    class SearchPage(msgspec.Struct, gc=False):
+        Count: Any = 0
+        SearchResults: List[Listing] = []
+
+    _page_decoder = msgspec.json.Decoder(SearchPage)
+else:
+    Listing = None
+
+
+def _decode_msgspec(body):
+    page = _page_decoder.decode(body)
+    return {"Count": page.Count, "SearchResults": page.SearchResults}
+
+
+DECODERS = {
+    "msgspec": _decode_msgspec if msgspec is not None else None,
+    "orjson": orjson.loads if orjson is not None else None,
+    "json": json.loads,
+}
+
+
+def get_decoder(name="auto"):
+    """Returns a function decoding a search response body.
+
+    The result is a dict with ``Count`` and ``SearchResults``. With msgspec
+    the listings are ``Listing`` structs holding only the fields the parser
+    normalizes; the other decoders return the full JSON as dicts.
+    """
+    if name == "auto":
+        name = next(candidate for candidate, decoder in DECODERS.items() if decoder is not None)
+    decoder = DECODERS.get(name)
+    if decoder is None:
+        logger.warning(f"JSON decoder '{name}' is not available, falling back to json")
+        name, decoder = "json", json.loads
+    logger.info(f"Using {name} to decode search responses")
+    return decoder
@@ -0,0 +1,523 @@
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import (
+    Column,
+    MetaData,
+    String,
+    Table,
+    and_,
+    bindparam,
+    delete,
+    exists,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import OperationalError
+
+from config import config
+from models import Car, CarHistory, ParseSession
+from ratelimit import backoff_delay
+from records import FIELD_NAMES
+from snapshots import SnapshotWriter, prune_snapshots, snapshot_suffix
+
+logger = logging.getLogger(__name__)
+
+TRACKED_FIELDS = config.TRACKED_FIELDS
+
+# Hashes are prefixed with a digest of the tracked field list, so rows hashed
+# under a different list can be found and rehashed on their own.
+HASH_SCHEME = hashlib.blake2b(','.join(TRACKED_FIELDS).encode('utf-8'), digest_size=4).hexdigest()
+
+ROW_FIELDS = FIELD_NAMES + ('content_hash',)
+
+
+def _comparable(value):
+    return str(value) if isinstance(value, datetime) else value
+
+
+def _hashable(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return _comparable(value)
+
+
+def content_hash(car):
+    """Digest of the tracked fields of ``car``, equal for equal values
+    whether they come from the API or from the ``cars`` table."""
+    values = json.dumps([_hashable(car.get(field)) for field in TRACKED_FIELDS], ensure_ascii=False)
+    digest = hashlib.blake2b(values.encode('utf-8'), digest_size=16).hexdigest()
+    return f'{HASH_SCHEME}:{digest}'
+
+
+def diff_car(current_car, previous_car):
+    changes = {}
+    for field in TRACKED_FIELDS:
+        current_value = current_car.get(field)
+        previous_value = previous_car.get(field)
+        if _comparable(current_value) != _comparable(previous_value):
+            changes[field] = {'old': previous_value, 'new': current_value}
+    return changes
+
+
+CARS = Car.__table__
+
+# Unlogged table the crawl is loaded into before it is diffed against
+# ``cars``. Rows are keyed by session, so they survive the per-chunk commits
+# of the writer and a resumed task can carry on from its recorded progress.
+STAGING = Table(
+    'crawl_staging',
+    MetaData(),
+    Column('session_id', String(100), primary_key=True),
+    *[
+        Column(column.name, column.type, primary_key=column.name == 'encar_id')
+        for column in CARS.columns
+        if column.name in ROW_FIELDS
+    ],
+    prefixes=['UNLOGGED'],
+)
+
+STAGED_COLUMNS = [STAGING.c[name] for name in ROW_FIELDS]
+
+
+def tracked_changes(current, previous):
+    return current.content_hash.is_distinct_from(previous.content_hash)
+
+
+def upsert_statement(source):
+    """``INSERT ... ON CONFLICT (encar_id) DO UPDATE`` for a select of car rows.
+
+    Stored cars are only touched when their content hash changed or they were
+    deactivated; those get the new values, are reactivated and have
+    ``updated_at``/``last_seen_at`` bumped.
+    """
+    stmt = insert(Car).from_select(ROW_FIELDS, source)
+    columns = {name: stmt.excluded[name] for name in ROW_FIELDS if name != 'encar_id'}
+    return stmt.on_conflict_do_update(
+        index_elements=[Car.encar_id],
+        set_={**columns, 'updated_at': func.now(), 'last_seen_at': func.now(), 'is_active': True},
+        where=or_(tracked_changes(CARS.c, stmt.excluded), Car.is_active == False),
+    )
+
+
+HISTORY_FIELDS = ('price', 'mileage', 'sales_status', 'modified_date')
+
+
+def record_history(stmt, session_id, event):
+    """Wraps a ``cars`` insert or update so the rows it writes are also
+    appended to ``car_history`` in the same statement.
+
+    ``event`` is either a fixed name or a SQL expression over the
+    statement's ``RETURNING`` columns.
+    """
+    written = stmt.returning(
+        Car.id, Car.encar_id, *[CARS.c[field] for field in HISTORY_FIELDS], event.label('event')
+    ).cte('written')
+    return insert(CarHistory).from_select(
+        ['car_id', 'encar_id', 'session_id', 'event', *HISTORY_FIELDS],
+        select(
+            written.c.id,
+            written.c.encar_id,
+            literal(session_id),
+            written.c.event,
+            *[written.c[field] for field in HISTORY_FIELDS],
+        ),
+    )
+
+
+def chunked(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def suppress_incomplete_removals(missing_cars, parse_result):
+    removed_car_ids = set(missing_cars)
+    if not parse_result.has_incomplete_slices:
+        return removed_car_ids
+
+    kept_ids = {
+        car_id for car_id in removed_car_ids
+        if not parse_result.covers_incomplete_slice(missing_cars[car_id])
+    }
+    logger.warning(
+        f"Crawl left {len(parse_result.incomplete_slices)} slices incomplete - "
+        f"keeping {len(removed_car_ids) - len(kept_ids)} of {len(removed_car_ids)} missing cars active"
+    )
+    return kept_ids
+
+
+@dataclass
+class ChunkChanges:
+    new: List[dict] = field(default_factory=list)
+    new_count: int = 0
+    updated: List[dict] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+
+class CarWriter:
+    """Writer stage of the crawl pipeline.
+
+    Receives normalized page batches while the crawl is still running,
+    streams them to the snapshot file and bulk-loads them into the
+    ``crawl_staging`` table. ``finish`` then works out new, updated and
+    removed cars with joins on ``encar_id`` against ``cars`` and applies them
+    in set-based statements, so the database rather than the previous
+    snapshot file is what the crawl is diffed against.
+
+    The changes are applied in chunks of ``INGEST_CHUNK_SIZE`` staged or
+    active cars, each in its own transaction, so row locks are only held for
+    one chunk at a time. Every chunk commits its stage, keyset cursor and
+    counts on the ``ParseSession``; a chunk that fails is retried, and a task
+    resumed for the same session skips the chunks already committed.
+    """
+
+    chunk_size = 1000
+
+    def __init__(self, db_session, parse_session, is_first_run, output_dir):
+        self.db_session = db_session
+        self.parse_session = parse_session
+        self.session_id = parse_session.session_id
+        self.is_first_run = is_first_run
+        self.output_dir = Path(output_dir)
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.ingest_chunk_size = config.INGEST_CHUNK_SIZE
+
+        self.suffix = snapshot_suffix(config.SNAPSHOT_CODEC)
+        header = {'session_id': self.session_id, 'timestamp': self.timestamp}
+        self.current_file = SnapshotWriter(self.output_dir / f"current_cars{self.suffix}", header)
+        self.new_file = SnapshotWriter(self.output_dir / f"new_cars_{self.timestamp}{self.suffix}", header)
+        self.updated_file = SnapshotWriter(self.output_dir / f"updated_cars_{self.timestamp}{self.suffix}", header)
+        self.removed_file = SnapshotWriter(self.output_dir / f"removed_cars_{self.timestamp}{self.suffix}", header)
+
+        self.seen_ids = set()
+        self.max_modified_date = None
+        # Non-zero when an earlier attempt at this session committed chunks.
+        self.new_count = parse_session.new_cars_added or 0
+        self.updated_count = parse_session.cars_updated or 0
+        self.removed_count = parse_session.cars_removed or 0
+
+        STAGING.create(self.db_session.connection(), checkfirst=True)
+        self._purge_staging()
+        self.db_session.commit()
+
+    def _purge_staging(self):
+        # Rows of sessions that failed or finished without cleaning up, and
+        # of sessions too old to be resumed, which may never be marked failed.
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=config.CHECKPOINT_TTL)
+        self.db_session.execute(
+            delete(STAGING).where(
+                STAGING.c.session_id != self.session_id,
+                ~exists().where(
+                    ParseSession.session_id == STAGING.c.session_id,
+                    ParseSession.status == 'running',
+                    ParseSession.started_at >= cutoff,
+                ),
+            )
+        )
+
+    def _snapshot(self, car_data):
+        self.current_file.write(car_data.as_dict())
+
+    def write_batch(self, batch):
+        rows = []
+
+        for car_data in batch:
+            encar_id = car_data['encar_id']
+            if encar_id in self.seen_ids:
+                continue
+            self.seen_ids.add(encar_id)
+            self._snapshot(car_data)
+
+            modified_date = car_data['modified_date']
+            if modified_date and (self.max_modified_date is None or modified_date > self.max_modified_date):
+                self.max_modified_date = modified_date
+
+            row = car_data.as_dict()
+            row['session_id'] = self.session_id
+            row['content_hash'] = content_hash(row)
+            rows.append(row)
+
+        if not rows:
+            return
+        for chunk in chunked(rows, self.chunk_size):
+            self.db_session.execute(insert(STAGING).values(chunk).on_conflict_do_nothing())
+        self.db_session.commit()
+
+    def _chunks(self, column, where, start):
+        """Yields ``(start, end]`` ranges of ``column`` that each hold up to
+        ``ingest_chunk_size`` rows matching ``where``."""
+        while True:
+            window = (
+                select(column.label('key'))
+                .where(where, column > start)
+                .order_by(column)
+                .limit(self.ingest_chunk_size)
+                .subquery()
+            )
+            end = self.db_session.execute(select(func.max(window.c.key))).scalar()
+            if end is None:
+                return
+            yield start, end
+            start = end
+
+    def _resume_cursor(self, stage, initial):
+        if self.parse_session.ingest_stage != stage or self.parse_session.ingest_cursor is None:
+            return initial
+        cursor = self.parse_session.ingest_cursor
+        logger.info(f"Resuming {stage} of session {self.session_id} after {cursor}")
+        return type(initial)(cursor)
+
+    def _run_chunk(self, stage, cursor, work):
+        """Runs ``work`` and commits its changes together with the progress
+        of this session, retrying on connection and lock errors."""
+        for attempt in range(config.INGEST_CHUNK_RETRIES + 1):
+            try:
+                changes = work()
+                self.parse_session.ingest_stage = stage
+                self.parse_session.ingest_cursor = str(cursor)
+                self.parse_session.ingest_chunks = (self.parse_session.ingest_chunks or 0) + 1
+                self.parse_session.new_cars_added = self.new_count + changes.new_count
+                self.parse_session.cars_updated = self.updated_count + len(changes.updated)
+                self.parse_session.cars_removed = self.removed_count + len(changes.removed)
+                self.db_session.commit()
+                break
+            except OperationalError as e:
+                self.db_session.rollback()
+                if attempt >= config.INGEST_CHUNK_RETRIES:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"Ingest chunk {stage} up to {cursor} failed, retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+
+        self._write_changes(changes)
+        # Keep the identity map down to the session record between chunks.
+        self.db_session.expunge_all()
+        self.db_session.add(self.parse_session)
+
+    def _write_changes(self, changes):
+        for row in changes.new:
+            self.new_file.write(row)
+        for row in changes.updated:
+            self.updated_file.write(row)
+        for encar_id in changes.removed:
+            self.removed_file.write(encar_id)
+
+        self.new_count += changes.new_count
+        self.updated_count += len(changes.updated)
+        self.removed_count += len(changes.removed)
+        logger.info(
+            f"Ingested chunk {self.parse_session.ingest_chunks}: {self.new_count} new, "
+            f"{self.updated_count} updated, {self.removed_count} removed so far"
+        )
+
+    def _apply_chunks(self):
+        staged = STAGING.c.session_id == self.session_id
+        start = self._resume_cursor('applying', '')
+        for start, end in self._chunks(STAGING.c.encar_id, staged, start):
+            in_chunk = and_(staged, STAGING.c.encar_id > start, STAGING.c.encar_id <= end)
+            self._run_chunk('applying', end, partial(self._apply_chunk, in_chunk))
+
+    def _apply_chunk(self, in_chunk):
+        changes = ChunkChanges()
+        self._collect_new(in_chunk, changes)
+        self._collect_updated(in_chunk, changes)
+        self._apply(in_chunk)
+        self._touch(in_chunk)
+        return changes
+
+    def _collect_new(self, in_chunk, changes):
+        new_cars = (
+            select(*STAGED_COLUMNS)
+            .outerjoin(CARS, CARS.c.encar_id == STAGING.c.encar_id)
+            .where(in_chunk, CARS.c.id.is_(None))
+        )
+        if self.is_first_run:
+            changes.new_count = self.db_session.execute(
+                select(func.count()).select_from(new_cars.subquery())
+            ).scalar()
+            return
+
+        changes.new = [dict(row) for row in self.db_session.execute(new_cars).mappings()]
+        changes.new_count = len(changes.new)
+
+    def _collect_updated(self, in_chunk, changes):
+        previous = [CARS.c[field].label(f'previous_{field}') for field in TRACKED_FIELDS]
+        updated_cars = (
+            select(*STAGED_COLUMNS, CARS.c.is_active.label('previous_is_active'), *previous)
+            .join(CARS, CARS.c.encar_id == STAGING.c.encar_id)
+            .where(in_chunk, or_(tracked_changes(STAGING.c, CARS.c), CARS.c.is_active == False))
+        )
+        for row in self.db_session.execute(updated_cars).mappings():
+            current_car = {name: row[name] for name in FIELD_NAMES}
+            previous_car = {field: row[f'previous_{field}'] for field in TRACKED_FIELDS}
+            changes_by_field = diff_car(current_car, previous_car)
+            if not row['previous_is_active']:
+                changes_by_field['is_active'] = {'old': False, 'new': True}
+            changes.updated.append({**current_car, 'changes': changes_by_field})
+
+    def _apply(self, in_chunk):
+        upsert = upsert_statement(select(*STAGED_COLUMNS).where(in_chunk))
+        # xmax is 0 only for rows this statement inserted.
+        event = literal_column("CASE WHEN xmax = 0 THEN 'new' ELSE 'updated' END")
+        self.db_session.execute(record_history(upsert, self.session_id, event))
+
+    def _touch(self, in_chunk):
+        self.db_session.execute(
+            update(CARS)
+            .where(CARS.c.encar_id == STAGING.c.encar_id, in_chunk)
+            .values(last_seen_at=func.now(), missed_sessions=0, updated_at=CARS.c.updated_at)
+        )
+
+    def _missing_cars(self, missing):
+        rows = self.db_session.execute(
+            select(CARS.c.encar_id, CARS.c.manufacturer, CARS.c.year, CARS.c.price).where(missing)
+        ).mappings()
+        return {row['encar_id']: dict(row) for row in rows}
+
+    def _remove_missing(self, parse_result):
+        logger.info("Counting missed sessions of active cars not seen in this session")
+        active = CARS.c.is_active == True
+        start = self._resume_cursor('removing', 0)
+        for start, end in self._chunks(CARS.c.id, active, start):
+            in_chunk = and_(active, CARS.c.id > start, CARS.c.id <= end)
+            self._run_chunk('removing', end, partial(self._remove_chunk, in_chunk, parse_result))
+
+        if self.removed_file.close():
+            logger.info(f"Saved {self.removed_file.count} removed car IDs to file")
+
+    def _remove_chunk(self, in_chunk, parse_result):
+        missing = and_(in_chunk, ~exists().where(
+            STAGING.c.session_id == self.session_id,
+            STAGING.c.encar_id == CARS.c.encar_id,
+        ))
+        if parse_result.has_incomplete_slices:
+            missing_car_ids = suppress_incomplete_removals(self._missing_cars(missing), parse_result)
+            if not missing_car_ids:
+                return ChunkChanges()
+            missing = Car.encar_id.in_(missing_car_ids)
+        return ChunkChanges(removed=self._deactivate(missing))
+
+    def _drop_staging(self):
+        self.db_session.execute(delete(STAGING).where(STAGING.c.session_id == self.session_id))
+        self.parse_session.ingest_stage = 'done'
+
+    def finish(self, parse_result):
+        """Applies the staged crawl chunk by chunk. The staging rows are
+        deleted in the caller's final transaction, which completes the session."""
+        if self.parse_session.ingest_stage != 'removing':
+            self._apply_chunks()
+
+        if not self.is_first_run:
+            self._remove_missing(parse_result)
+
+        self._drop_staging()
+        if self.current_file.close(total_cars=self.current_file.count):
+            # Indented JSON snapshot written before the NDJSON format.
+            (self.output_dir / "current_cars.json").unlink(missing_ok=True)
+        self._close_change_files()
+
+    def _close_change_files(self):
+        self.new_file.close()
+        self.updated_file.close()
+        prune_snapshots(self.output_dir, config.SNAPSHOT_RETENTION_DAYS)
+
+        logger.info(f"Changes summary:")
+        logger.info(f"  New cars: {self.new_count}")
+        logger.info(f"  Updated cars: {self.updated_count}")
+        logger.info(f"  Removed cars: {self.removed_count}")
+
+    def _deactivate(self, missing):
+        """Counts a missed session for the active cars matching ``missing``
+        and deactivates those that missed ``REMOVAL_GRACE_SESSIONS`` in a row.
+        Returns the ids of the deactivated cars."""
+        self.db_session.execute(
+            update(Car)
+            .where(missing, Car.is_active == True)
+            .values(missed_sessions=Car.missed_sessions + 1, updated_at=Car.updated_at)
+        )
+        deactivate = (
+            update(Car)
+            .where(missing, Car.is_active == True, Car.missed_sessions >= config.REMOVAL_GRACE_SESSIONS)
+            .values(is_active=False)
+        )
+        history = record_history(deactivate, self.session_id, literal('removed'))
+        return list(self.db_session.execute(history.returning(CarHistory.encar_id)).scalars())
+
+    def discard(self):
+        # Staged rows of the failed session are purged by the next writer.
+        self.current_file.discard()
+        self.new_file.discard()
+        self.updated_file.discard()
+        self.removed_file.discard()
+
+
+class DeltaCarWriter(CarWriter):
+    """Writer stage of a delta crawl.
+
+    Only cars modified since the last watermark arrive here, so nothing is
+    marked as removed and ``current_cars.json`` is left alone for the next
+    full crawl.
+    """
+
+    def __init__(self, db_session, parse_session, output_dir):
+        super().__init__(db_session, parse_session, False, output_dir)
+        self.current_file = None
+
+    def _snapshot(self, car_data):
+        pass
+
+    def finish(self, parse_result):
+        self._apply_chunks()
+        self._drop_staging()
+        self._close_change_files()
+
+    def discard(self):
+        self.new_file.discard()
+        self.updated_file.discard()
+
+
+def stale_hashes():
+    return CARS.c.content_hash.is_(None) | ~CARS.c.content_hash.startswith(f'{HASH_SCHEME}:')
+
+
+def ensure_content_hashes(db_session):
+    if db_session.query(exists().where(stale_hashes())).scalar():
+        logger.info(f"Stored content hashes do not match tracked fields {TRACKED_FIELDS} - rehashing")
+        rehash_cars(db_session)
+
+
+def rehash_cars(db_session, chunk_size=5000):
+    """Recomputes ``content_hash`` for rows hashed under another tracked
+    field list. Only the hash column is written; each chunk is committed."""
+    columns = [CARS.c[field] for field in TRACKED_FIELDS]
+    rehashed = 0
+    while True:
+        rows = db_session.execute(
+            select(CARS.c.id, *columns).where(stale_hashes()).limit(chunk_size)
+        ).mappings().all()
+        if not rows:
+            break
+        db_session.execute(
+            update(CARS).where(CARS.c.id == bindparam('row_id')).values(
+                content_hash=bindparam('row_hash'),
+                updated_at=CARS.c.updated_at,
+            ),
+            [{'row_id': row['id'], 'row_hash': content_hash(row)} for row in rows],
+        )
+        db_session.commit()
+        rehashed += len(rows)
+        logger.info(f"Rehashed {rehashed} cars so far...")
+    return rehashed
@@ -1,5 +1,8 @@
 from sqlalchemy import (
+    BigInteger,
     Column,
+    Identity,
+    Index,
     Integer,
     String,
     Float,
@@ -46,12 +49,51 @@ class Car(Base):
     office_name = Column(String(200))
     dealer_name = Column(String(100))
     modified_date = Column(DateTime)
+    content_hash = Column(String(64))
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     last_seen_at = Column(DateTime, default=func.now())
+    missed_sessions = Column(Integer, default=0, server_default="0")
     is_active = Column(Boolean, default=True, index=True)
 
 
+# (sort column, id) indexes over active cars, so the backend's cursor
+# pagination of /cars is an index range scan for every sort option.
+KEYSET_SORT_COLUMNS = ("price", "year", "manufacturer")
+
+for _column in KEYSET_SORT_COLUMNS:
+    Index(
+        f"ix_cars_active_{_column}_id",
+        Car.__table__.c[_column],
+        Car.id,
+        postgresql_where=Car.is_active,
+    )
+
+
+class CarHistory(Base):
+    """Append-only log of car states, range-partitioned by month.
+
+    Partitions are created by ``database.ensure_history_partitions``.
+    """
+
+    __tablename__ = "car_history"
+    __table_args__ = (
+        Index("ix_car_history_car_id_recorded_at", "car_id", "recorded_at"),
+        {"postgresql_partition_by": "RANGE (recorded_at)"},
+    )
+
+    id = Column(BigInteger, Identity(), primary_key=True)
+    recorded_at = Column(DateTime, primary_key=True, server_default=func.now())
+    car_id = Column(Integer, nullable=False)
+    encar_id = Column(String(50), nullable=False)
+    session_id = Column(String(100))
+    event = Column(String(20), nullable=False)
+    price = Column(Float)
+    mileage = Column(Float)
+    sales_status = Column(String(50))
+    modified_date = Column(DateTime)
+
+
 class ParseSession(Base):
     __tablename__ = "parse_sessions"
 
@@ -60,8 +102,15 @@ class ParseSession(Base):
     started_at = Column(DateTime, default=func.now())
     completed_at = Column(DateTime)
     status = Column(String(50), default="running")
+    mode = Column(String(20), default="full")
     total_cars_found = Column(Integer, default=0)
     new_cars_added = Column(Integer, default=0)
     cars_updated = Column(Integer, default=0)
     cars_removed = Column(Integer, default=0)
     error_message = Column(Text)
+    dead_letter_pages = Column(JSON)
+    telemetry = Column(JSON)
+    max_modified_date = Column(DateTime)
+    ingest_stage = Column(String(20))
+    ingest_cursor = Column(String(100))
+    ingest_chunks = Column(Integer, default=0)
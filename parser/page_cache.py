@@ -0,0 +1,109 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+
+
+class PageCacheMiss(LookupError):
+    pass
+
+
+class PageCache:
+    """Gzip-compressed store of raw search responses on disk.
+
+    Entries are keyed by ``(query, sort_option, offset, limit)``. In
+    ``record`` mode a response younger than ``ttl`` seconds is served from
+    disk and anything else is fetched and stored, so a rerun after a crash
+    does not hit the API again for pages it already has. In ``replay`` mode
+    responses are only ever read from disk, regardless of age, and a page
+    that was never recorded raises ``PageCacheMiss``.
+    """
+
+    def __init__(self, directory, mode="record", ttl=6 * 3600):
+        if mode not in MODES:
+            raise ValueError(f"Unknown page cache mode '{mode}', expected one of {', '.join(MODES)}")
+        self.directory = Path(directory)
+        self.mode = mode
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    @property
+    def replay(self):
+        return self.mode == "replay"
+
+    def _path(self, query, sort_option, offset, limit):
+        key = f"{query}|{sort_option}|{offset}|{limit}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.json.gz"
+
+    def _is_fresh(self, path):
+        return self.replay or time.time() - path.stat().st_mtime < self.ttl
+
+    def _read(self, path):
+        try:
+            if not self._is_fresh(path):
+                return None
+            with gzip.open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError) as e:
+            logger.warning(f"Ignoring unreadable cached page {path.name}: {e}")
+            return None
+
+    def _write(self, path, body):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with gzip.open(tmp_path, "wb", compresslevel=5) as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+    async def get(self, query, sort_option, offset, limit):
+        path = self._path(query, sort_option, offset, limit)
+        body = await asyncio.to_thread(self._read, path)
+        if body is not None:
+            self.hits += 1
+            return body
+        self.misses += 1
+        if self.replay:
+            raise PageCacheMiss(f"Page not recorded: {query} {sort_option} {offset}|{limit}")
+        return None
+
+    async def put(self, query, sort_option, offset, limit, body):
+        path = self._path(query, sort_option, offset, limit)
+        try:
+            await asyncio.to_thread(self._write, path, body)
+        except OSError as e:
+            logger.warning(f"Failed to cache page {path.name}: {e}")
+
+    def purge_expired(self):
+        if self.mode != "record" or not self.directory.exists():
+            return 0
+        removed = 0
+        cutoff = time.time() - self.ttl
+        for path in self.directory.glob("*/*.json.gz"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        if removed:
+            logger.info(f"Removed {removed} expired pages from {self.directory}")
+        return removed
+
+    @property
+    def stats(self):
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses}
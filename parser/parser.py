@@ -1,11 +1,24 @@
 import asyncio
 import aiohttp
 import logging
+import math
+import time
 from typing import Dict, List, Set
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import uuid
 
+from celery.exceptions import SoftTimeLimitExceeded
+
+from partitioner import PARTITION_ROOTS, FacetPartitioner, Slice
+from planner import CrawlPlanner
+from decoding import get_decoder
+from records import listing_id, normalize_car
+from ratelimit import AdaptiveThrottle
+from scheduler import ConfigState, PageScheduler
+from sharding import slice_from_dict
+from telemetry import CrawlTelemetry
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -16,17 +29,61 @@ logger = logging.getLogger(__name__)
 @dataclass
 class ParseResult:
     session_id: str
-    total_cars_found: int
-    new_cars: List[Dict]
-    updated_cars: List[Dict]
-    removed_car_ids: Set[str]
-    duration_seconds: float
+    total_cars_found: int = 0
+    new_cars: List[Dict] = field(default_factory=list)
+    updated_cars: List[Dict] = field(default_factory=list)
+    removed_car_ids: Set[str] = field(default_factory=set)
+    duration_seconds: float = 0.0
     error_message: str = None
+    dead_letter_pages: List[Dict] = field(default_factory=list)
+    incomplete_slices: List[Slice] = field(default_factory=list)
+    telemetry: Dict = None
+
+    @property
+    def has_unrecovered_pages(self):
+        return bool(self.dead_letter_pages)
+
+    @property
+    def has_incomplete_slices(self):
+        return bool(self.incomplete_slices)
+
+    def covers_incomplete_slice(self, car):
+        return any(slice_ is None or slice_.matches(car) for slice_ in self.incomplete_slices)
+
+
+@dataclass(frozen=True)
+class CrawlConfig:
+    query_param: str
+    query_name: str
+    sort_option: str
+    page_size: int
+    max_pages: int = None
+    partition: Slice = None
+
+    @property
+    def name(self):
+        return f"{self.query_name}_{self.sort_option}_{self.page_size}"
+
+    @property
+    def overflow(self):
+        # A partition slice above the result window: several sort orders
+        # reach most of it, but not necessarily every listing.
+        return self.partition is not None and self.max_pages is None
+
+
+def config_from_dict(data):
+    return CrawlConfig(**{**data, "partition": slice_from_dict(data["partition"])})
 
 
 class EncarAPI:
     BASE_URL = "https://api.encar.com/search/car/list"
 
+    def __init__(self, throttle=None, decoder="auto", cache=None, telemetry=None):
+        self.throttle = throttle or AdaptiveThrottle()
+        self.telemetry = telemetry or CrawlTelemetry()
+        self.cache = cache if cache and cache.enabled else None
+        self.decode = get_decoder(decoder)
+
     def _setup_headers(self):
         headers = {
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36",
@@ -68,38 +125,113 @@ class EncarAPI:
 
         url = f"{base_url}?{'&'.join(url_parts)}"
         
-        logger.debug(f"Making request to: {url}")
-
         try:
-            async with session.get(url) as response:
-                response.raise_for_status()
-                data = await response.json()
-                
-                search_results = data.get("SearchResults", [])
-                total_count = data.get("Count", 0)
-                
-                logger.debug(f"API Response - Page {page}: {len(search_results)} cars, Total: {total_count}")
-                
-                return data, query, sort_option, page, limit
-                
+            body = None
+            if self.cache:
+                body = await self.cache.get(query, sort_option, offset, limit)
+            if body is None:
+                logger.debug(f"Making request to: {url}")
+                body = await self._fetch(session, url)
+                if self.cache:
+                    await self.cache.put(query, sort_option, offset, limit, body)
+
+            data = self.decode(body)
+            search_results = data.get("SearchResults", [])
+            total_count = data.get("Count", 0)
+
+            logger.debug(f"API Response - Page {page}: {len(search_results)} cars, Total: {total_count}")
+
+            return data, query, sort_option, page, limit
+
         except Exception as e:
             logger.error(f"API Request failed - Page {page}, Sort: {sort_option}, Query: {query[:30]}...: {e}")
             raise
 
+    async def _fetch(self, session, url):
+        status = None
+        retry_after = None
+        size = 0
+        async with self.throttle:
+            started = time.monotonic()
+            try:
+                async with session.get(url) as response:
+                    status = response.status
+                    retry_after = self._retry_after(response)
+                    response.raise_for_status()
+                    body = await response.read()
+                    size = len(body)
+                    return body
+            finally:
+                elapsed = time.monotonic() - started
+                self.throttle.record(status, elapsed, retry_after)
+                self.telemetry.record_response(status, elapsed, size)
+
+    @staticmethod
+    def _retry_after(response):
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+
+SWEEP_QUERIES = [
+    ("q=(And.Hidden.N._.CarType.N.)", "Hidden_N_CarType_N"),
+    ("q=(And.Hidden.Y._.CarType.N.)", "Hidden_Y_CarType_N"),
+    ("q=(And.Hidden.N._.CarType.Y.)", "Hidden_N_CarType_Y"),
+    ("q=(And.Hidden.Y._.CarType.Y.)", "Hidden_Y_CarType_Y"),
+    ("q=(Or.CarType.N._.CarType.Y.)", "Or_CarType_N_Y"),
+    ("q=(Or.CarType.Y._.CarType.N.)", "Or_CarType_Y_N"),
+]
+
+
+def shard_names(strategy):
+    # Sweep configs overlap across queries, partition and delta configs
+    # are grouped under disjoint roots; either way a shard is the unit
+    # one worker crawls on its own.
+    if strategy == "sweep":
+        return [query_name for _, query_name in SWEEP_QUERIES]
+    return [root.name for root in PARTITION_ROOTS]
+
 
 class EncarParser:
-    def __init__(self, max_concurrent=10):
+    def __init__(
+        self,
+        max_concurrent=10,
+        request_delay=0.03,
+        planner=None,
+        strategy="sweep",
+        partition_window=10000,
+        latency_target=5.0,
+        retry_attempts=4,
+        retry_backoff=1.0,
+        retry_backoff_max=30.0,
+        json_decoder="auto",
+        page_cache=None,
+        modified_since=None,
+        shard=None,
+        dedup=None,
+        checkpoint=None,
+    ):
         self.max_concurrent = max_concurrent
-        self.api = EncarAPI()
-
-        self.queries = [
-            ("q=(And.Hidden.N._.CarType.N.)", "Hidden_N_CarType_N"),
-            ("q=(And.Hidden.Y._.CarType.N.)", "Hidden_Y_CarType_N"),
-            ("q=(And.Hidden.N._.CarType.Y.)", "Hidden_N_CarType_Y"),
-            ("q=(And.Hidden.Y._.CarType.Y.)", "Hidden_Y_CarType_Y"),
-            ("q=(Or.CarType.N._.CarType.Y.)", "Or_CarType_N_Y"),
-            ("q=(Or.CarType.Y._.CarType.N.)", "Or_CarType_Y_N"),
-        ]
+        self.retry_attempts = retry_attempts
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.throttle = AdaptiveThrottle(
+            max_concurrent, request_delay, latency_target=latency_target
+        )
+        self.telemetry = CrawlTelemetry()
+        self.api = EncarAPI(self.throttle, decoder=json_decoder, cache=page_cache, telemetry=self.telemetry)
+        self.planner = planner or CrawlPlanner()
+        self.strategy = strategy
+        self.partition_window = partition_window
+        self.modified_since = modified_since
+        self.dedup = dedup
+        self.checkpoint = checkpoint
+
+        self.queries = list(SWEEP_QUERIES)
 
         self.sort_options = [
             "ModifiedDate",
@@ -110,146 +242,285 @@ class EncarParser:
             "Year",
         ]
         self.page_sizes = [500, 400, 300, 200, 100, 50, 20]
+
+        self.partition_roots = list(PARTITION_ROOTS)
+
+        if shard is not None:
+            self.restrict_to_shard(shard)
         
         logger.info(f"Parser initialized:")
+        logger.info(f"   Strategy: {strategy}")
         logger.info(f"   Queries: {len(self.queries)}")
         logger.info(f"   Sort options: {len(self.sort_options)}")
         logger.info(f"   Page sizes: {len(self.page_sizes)}")
         logger.info(f"   Total configurations: {len(self.queries) * len(self.sort_options) * len(self.page_sizes)}")
         logger.info(f"   Max concurrent: {max_concurrent}")
+        logger.info(f"   Request delay: {request_delay}s")
+        if modified_since:
+            logger.info(f"   Modified since: {modified_since}")
+        if shard is not None:
+            logger.info(f"   Shard: {shard}")
+
+    def restrict_to_shard(self, shard):
+        if shard not in shard_names(self.strategy):
+            raise ValueError(f"Unknown shard '{shard}' for strategy '{self.strategy}'")
+        self.queries = [query for query in self.queries if query[1] == shard]
+        self.partition_roots = [root for root in self.partition_roots if root.name == shard]
 
     def normalize_car_data(self, car_data):
-        normalized = {
-            "encar_id": str(car_data.get("Id", "")),
-            "manufacturer": car_data.get("Manufacturer", ""),
-            "model": car_data.get("Model", ""),
-            "badge": car_data.get("Badge", ""),
-            "badge_detail": car_data.get("BadgeDetail", ""),
-            "transmission": car_data.get("Transmission", ""),
-            "fuel_type": car_data.get("FuelType", ""),
-            "year": car_data.get("Year"),
-            "form_year": car_data.get("FormYear", ""),
-            "mileage": car_data.get("Mileage"),
-            "price": car_data.get("Price"),
-            "separation": car_data.get("Separation", []),
-            "trust": car_data.get("Trust", []),
-            "service_mark": car_data.get("ServiceMark", []),
-            "condition": car_data.get("Condition", []),
-            "photo": car_data.get("Photo", ""),
-            "photos": car_data.get("Photos", []),
-            "service_copy_car": car_data.get("ServiceCopyCar", ""),
-            "sales_status": car_data.get("SalesStatus", ""),
-            "sell_type": car_data.get("SellType", ""),
-            "buy_type": car_data.get("BuyType", []),
-            "powerpack": car_data.get("Powerpack", ""),
-            "ad_words": car_data.get("AdWords", ""),
-            "hotmark": car_data.get("Hotmark", ""),
-            "office_city_state": car_data.get("OfficeCityState", ""),
-            "office_name": car_data.get("OfficeName", ""),
-            "dealer_name": car_data.get("DealerName", ""),
-        }
-
-        modified_date_str = car_data.get("ModifiedDate", "")
-        if modified_date_str:
-            try:
-                if "+" in modified_date_str:
-                    date_part = modified_date_str.split("+")[0].strip()
-                elif "-" in modified_date_str[-3:]:
-                    date_part = modified_date_str.split("-")[:-1]
-                    date_part = "-".join(date_part).strip()
-                else:
-                    date_part = modified_date_str.strip()
-
-                if "." in date_part:
-                    date_part = date_part.split(".")[0]
-
-                normalized["modified_date"] = datetime.strptime(
-                    date_part, "%Y-%m-%d %H:%M:%S"
+        return normalize_car(car_data)
+
+    def iter_configurations(self):
+        for query_param, query_name in self.queries:
+            for sort_option in self.sort_options:
+                for page_size in self.page_sizes:
+                    yield CrawlConfig(query_param, query_name, sort_option, page_size)
+
+    def configurations_for_slices(self, slices):
+        page_size = max(self.page_sizes)
+        configs = []
+        for slice_, count in slices:
+            if count <= self.partition_window:
+                configs.append(
+                    CrawlConfig(
+                        slice_.query,
+                        slice_.name,
+                        "ModifiedDate",
+                        page_size,
+                        max_pages=math.ceil(count / page_size) + 1,
+                        partition=slice_,
+                    )
                 )
-            except Exception as e:
-                logger.warning(f"Failed to parse date '{modified_date_str}' for car {normalized['encar_id']}: {e}")
-                normalized["modified_date"] = None
-        else:
-            normalized["modified_date"] = None
+            else:
+                for sort_option in self.sort_options:
+                    configs.append(
+                        CrawlConfig(
+                            slice_.query,
+                            slice_.name,
+                            sort_option,
+                            page_size,
+                            partition=slice_,
+                        )
+                    )
+        return configs
+
+    def delta_configurations(self):
+        page_size = max(self.page_sizes)
+        return [
+            CrawlConfig(
+                root.query,
+                root.name,
+                "ModifiedDate",
+                page_size,
+                max_pages=math.ceil(self.partition_window / page_size),
+                partition=root,
+            )
+            for root in self.partition_roots
+        ]
 
-        return normalized
+    async def build_configurations(self, session):
+        if self.strategy == "delta":
+            return self.delta_configurations()
+        if self.strategy == "partition":
+            partitioner = FacetPartitioner(
+                self.api,
+                window=self.partition_window,
+                max_concurrent=self.max_concurrent,
+                retry_attempts=self.retry_attempts,
+                retry_backoff=self.retry_backoff,
+            )
+            slices = await partitioner.partition(session, self.partition_roots)
+            return self.configurations_for_slices(slices)
+        return self.planner.plan(self.iter_configurations(), lambda cfg: cfg.name)
+
+    async def fetch_config_page(self, state, page, session, batches):
+        crawl_config = state.config
+        config_name = crawl_config.name
+        page_size = crawl_config.page_size
+        logger.debug(f"{config_name} - Fetching page {page}")
+
+        data, _, _, _, _ = await self.api.search_premium_async(
+            session, page, page_size, crawl_config.sort_option, crawl_config.query_param
+        )
+
+        state.pages_fetched += 1
+        search_results = data.get("SearchResults", [])
+
+        if state.total_count is None:
+            state.total_count = int(data.get("Count", 0) or 0)
+            if state.total_count:
+                state.max_pages = min(state.max_pages, math.ceil(state.total_count / page_size))
+                logger.debug(f"{config_name} - {state.total_count} cars, {state.max_pages} pages")
+
+        if not search_results:
+            state.consecutive_empty_pages += 1
+            logger.debug(f"{config_name} - Empty page {page} (consecutive: {state.consecutive_empty_pages})")
+            self.telemetry.record_page(config_name, crawl_config.sort_option, 0, 0)
+            if state.consecutive_empty_pages >= 3 or not state.total_count:
+                state.stopped = True
+            await self.checkpoint_page(state, page, [])
+            return
+
+        state.consecutive_empty_pages = 0
+        state.consecutive_failures = 0
+
+        car_ids = [listing_id(car) for car in search_results]
+        page_signature = f"{car_ids[0]}-{car_ids[-1]}-{len(car_ids)}"
+
+        if page_signature == state.last_page_signature:
+            state.consecutive_duplicate_pages += 1
+            logger.debug(f"{config_name} - Duplicate page {page} (consecutive: {state.consecutive_duplicate_pages})")
+            if state.consecutive_duplicate_pages >= 2:
+                state.stopped = True
+        else:
+            state.consecutive_duplicate_pages = 0
+            state.last_page_signature = page_signature
+
+        # Claimed before the planner marks the ids as seen: if the claim
+        # fails the page is retried, and the retry must still emit its cars.
+        claimed = None
+        if self.dedup is not None:
+            claimed = await self.dedup.claim(
+                [car_id for car_id in car_ids if car_id and car_id not in self.planner.seen_ids]
+            )
 
-    async def search_single_config_async(
-        self, query_param, query_name, sort_option, page_size, session
-    ):
-        config_name = f"{query_name}_{sort_option}_{page_size}"
-        logger.info(f"Starting config: {config_name}")
-        
-        all_cars = []
-        page = 0
-        consecutive_failures = 0
-        consecutive_empty_pages = 0
-        consecutive_duplicate_pages = 0
-        last_page_signature = None
-        estimated_max_pages = min(80, (20000 // page_size) + 10)
-        
-        logger.debug(f"Config {config_name} - Max pages: {estimated_max_pages}")
-
-        while (
-            consecutive_failures < 3
-            and consecutive_empty_pages < 3
-            and consecutive_duplicate_pages < 2
-            and page < estimated_max_pages
-        ):
-            try:
-                logger.debug(f"{config_name} - Fetching page {page}")
-                
-                data, _, _, _, _ = await self.api.search_premium_async(
-                    session, page, page_size, sort_option, query_param
-                )
+        new_ids = self.planner.record_page(config_name, car_ids)
 
-                search_results = data.get("SearchResults", [])
+        # Listings already seen earlier in this session are skipped before
+        # normalization, which is where most of the per-listing cost is.
+        batch = []
+        for car_id, car in zip(car_ids, search_results):
+            if car_id in new_ids:
+                new_ids.discard(car_id)
+                batch.append(normalize_car(car))
 
-                if not search_results:
-                    consecutive_empty_pages += 1
-                    logger.debug(f"{config_name} - Empty page {page} (consecutive: {consecutive_empty_pages})")
-                    page += 1
-                    continue
+        if self.modified_since is not None:
+            batch = self._modified_since_watermark(state, page, search_results, batch)
 
-                consecutive_empty_pages = 0
-                consecutive_failures = 0
+        if claimed is not None:
+            batch = [car for car in batch if car.encar_id in claimed]
 
-                first_id = search_results[0].get("Id")
-                last_id = search_results[-1].get("Id")
-                page_signature = f"{first_id}-{last_id}-{len(search_results)}"
+        cars_added = len(batch)
+        state.cars_added += cars_added
+        self.telemetry.record_page(config_name, crawl_config.sort_option, len(search_results), cars_added)
+        self.telemetry.record_unique_cars(len(self.planner.seen_ids))
 
-                if page_signature == last_page_signature:
-                    consecutive_duplicate_pages += 1
-                    logger.debug(f"{config_name} - Duplicate page {page} (consecutive: {consecutive_duplicate_pages})")
-                else:
-                    consecutive_duplicate_pages = 0
-                    last_page_signature = page_signature
+        logger.debug(f"{config_name} - Page {page}: {cars_added} new cars (total: {state.cars_added})")
 
-                cars_added = 0
-                for car in search_results:
-                    normalized_car = self.normalize_car_data(car)
-                    if normalized_car["encar_id"]:
-                        all_cars.append(normalized_car)
-                        cars_added += 1
+        if state.pages_fetched % 10 == 0:
+            logger.info(f"{config_name} - Progress: {state.pages_fetched} pages, {state.cars_added} cars")
 
-                logger.debug(f"{config_name} - Page {page}: {cars_added} cars added (total: {len(all_cars)})")
-                
-                if page % 10 == 0 and page > 0:
-                    logger.info(f"{config_name} - Progress: {page} pages, {len(all_cars)} cars")
+        if not self.planner.should_continue(config_name):
+            state.stopped = True
 
-                page += 1
-                await asyncio.sleep(0.03)
+        await self.checkpoint_page(state, page, batch)
+        if batch:
+            await batches.put(batch)
 
-            except Exception as e:
-                consecutive_failures += 1
-                logger.error(f"{config_name} - Page {page} failed (consecutive: {consecutive_failures}): {e}")
-                page += 1
+    async def checkpoint_page(self, state, page, batch):
+        if self.checkpoint is None:
+            return
+        try:
+            await self.checkpoint.record_page(state, page, batch)
+        except SoftTimeLimitExceeded:
+            raise
+        except Exception as e:
+            # A page missing from the checkpoint is only refetched on resume.
+            logger.warning(f"{state.config.name} - Failed to checkpoint page {page}: {e}")
+
+    async def plan_configurations(self, session):
+        if self.checkpoint is None:
+            return await self.build_configurations(session)
+        plan = await self.checkpoint.load_plan()
+        if plan is not None:
+            logger.info(f"Resuming checkpointed plan of {len(plan)} configurations")
+            return [config_from_dict(item) for item in plan]
+        configs = await self.build_configurations(session)
+        await self.checkpoint.save_plan(configs)
+        return configs
+
+    async def restore_checkpoint(self, batches):
+        progress = {}
+        if self.checkpoint is None:
+            return progress
+        async for batch in self.checkpoint.restore(progress):
+            self.planner.seen_ids.update(car.encar_id for car in batch)
+            await batches.put(batch)
+        return progress
+
+    @staticmethod
+    def resume_state(state, config_progress):
+        state.done_pages = config_progress.pages
+        state.stopped = config_progress.stopped
+        if config_progress.total_count is not None:
+            state.total_count = config_progress.total_count
+            state.max_pages = config_progress.max_pages
+
+    def _modified_since_watermark(self, state, page, search_results, batch):
+        # Delta configs are sorted by ModifiedDate, newest first, so once the
+        # last listing of a page is older than the watermark the rest of the
+        # config has nothing new.
+        oldest = normalize_car(search_results[-1]).modified_date
+        if oldest is not None and oldest < self.modified_since:
+            state.stopped = True
+            logger.info(f"{state.config.name} - Reached watermark on page {page}")
+        elif page + 1 >= state.max_pages and (state.total_count or 0) > state.max_pages * state.config.page_size:
+            logger.warning(
+                f"{state.config.name} - Watermark not reached within {state.max_pages} pages, "
+                f"older changes are left to the next full crawl"
+            )
+        return [
+            car for car in batch
+            if car.modified_date is None or car.modified_date >= self.modified_since
+        ]
 
-        logger.info(f"{config_name} completed: {len(all_cars)} cars from {page} pages")
-        return all_cars, config_name
+    def record_dead_letter(self, state, page, error, dead_letters):
+        crawl_config = state.config
+        state.dead_pages.append(page)
+        state.consecutive_failures += 1
+        dead_letters.append({
+            "config": crawl_config.name,
+            "query": crawl_config.query_param,
+            "sort_option": crawl_config.sort_option,
+            "page_size": crawl_config.page_size,
+            "page": page,
+            "error": str(error),
+        })
+        logger.error(f"{crawl_config.name} - Page {page} dead-lettered (consecutive: {state.consecutive_failures}): {error}")
+        if state.consecutive_failures >= 3:
+            state.stopped = True
+
+    async def close(self):
+        for client in (self.dedup, self.checkpoint):
+            if client is not None:
+                await client.close()
+
+    async def iter_page_batches(self, result, max_pending_batches=8):
+        batches = asyncio.Queue(maxsize=max_pending_batches)
+        crawl = asyncio.create_task(self._crawl(result, batches))
+        try:
+            while True:
+                batch = await batches.get()
+                if batch is None:
+                    break
+                self.telemetry.record_queue_depth(batches.qsize())
+                yield batch
+            await crawl
+        finally:
+            if not crawl.done():
+                crawl.cancel()
+                await asyncio.gather(crawl, return_exceptions=True)
 
     async def parse_all_configurations(self):
-        session_id = str(uuid.uuid4())
+        result = ParseResult(session_id=str(uuid.uuid4()))
+        all_current_cars = []
+        async for batch in self.iter_page_batches(result):
+            all_current_cars.extend(batch)
+        result.new_cars = all_current_cars
+        return result
+
+    async def _crawl(self, result, batches):
+        session_id = result.session_id
         start_time = datetime.now()
         
         logger.info(f"Starting parse session: {session_id}")
@@ -264,85 +535,117 @@ class EncarParser:
             
             logger.info(f"HTTP session configured - Concurrent limit: {self.max_concurrent}")
 
-            all_current_cars = {}
+            dead_letters = []
             completed_configs = 0
-            total_configs = len(self.queries) * len(self.sort_options) * len(self.page_sizes)
 
             async with aiohttp.ClientSession(
                 headers=headers, connector=connector, timeout=timeout
             ) as session:
                 logger.info(f"HTTP session started")
-                
-                tasks = []
-                for query_param, query_name in self.queries:
-                    for sort_option in self.sort_options:
-                        for page_size in self.page_sizes:
-                            task = self.search_single_config_async(
-                                query_param, query_name, sort_option, page_size, session
-                            )
-                            tasks.append(task)
-
-                logger.info(f"Created {len(tasks)} configuration tasks")
-                logger.info(f"Starting parallel execution...")
-
-                batch_size = min(self.max_concurrent, 20)
-                
-                for i in range(0, len(tasks), batch_size):
-                    batch = tasks[i:i + batch_size]
-                    batch_num = (i // batch_size) + 1
-                    total_batches = (len(tasks) + batch_size - 1) // batch_size
-                    
-                    logger.info(f"Processing batch {batch_num}/{total_batches} ({len(batch)} configs)")
-                    
-                    try:
-                        results = await asyncio.gather(*batch, return_exceptions=True)
-                        
-                        for result in results:
-                            completed_configs += 1
-                            
-                            if isinstance(result, Exception):
-                                logger.error(f"Config failed: {result}")
-                                continue
-
-                            cars, config_name = result
-                            
-                            new_in_config = 0
-                            for car in cars:
-                                car_id = car["encar_id"]
-                                if car_id and car_id not in all_current_cars:
-                                    all_current_cars[car_id] = car
-                                    new_in_config += 1
-                            
-                            logger.info(f"📊 {config_name}: {len(cars)} total, {new_in_config} unique")
-                            
-                            if completed_configs % 10 == 0:
-                                elapsed = (datetime.now() - start_time).total_seconds()
-                                progress = (completed_configs / total_configs) * 100
-                                logger.info(f"Progress: {completed_configs}/{total_configs} ({progress:.1f}%) - {len(all_current_cars)} unique cars - {elapsed:.1f}s elapsed")
-                        
-                        if i + batch_size < len(tasks):
-                            await asyncio.sleep(1)
-                            
-                    except Exception as e:
-                        logger.error(f"Batch {batch_num} failed: {e}")
+
+                configs = await self.plan_configurations(session)
+                progress = await self.restore_checkpoint(batches)
+                total_configs = len(configs)
+                states = [
+                    ConfigState(
+                        crawl_config,
+                        index,
+                        crawl_config.max_pages
+                        or min(80, (20000 // crawl_config.page_size) + 10),
+                    )
+                    for index, crawl_config in enumerate(configs)
+                ]
+                for state in states:
+                    if state.config.name in progress:
+                        self.resume_state(state, progress[state.config.name])
+
+                def should_start(state):
+                    if self.strategy == "sweep" and self.planner.coverage_flattened():
+                        logger.info(
+                            f"Coverage flattened at {len(self.planner.seen_ids)} unique cars - "
+                            f"skipping {state.config.name}"
+                        )
+                        return False
+                    logger.info(f"Starting config: {state.config.name}")
+                    return True
+
+                def finish_config(state):
+                    nonlocal completed_configs
+                    completed_configs += 1
+                    self.planner.finish_config(state.config.name)
+
+                    if state.pages_fetched:
+                        logger.info(f"📊 {state.config.name}: {state.pages_fetched} pages, {state.cars_added} unique")
+
+                    if completed_configs % 10 == 0:
+                        elapsed = (datetime.now() - start_time).total_seconds()
+                        progress = (completed_configs / total_configs) * 100
+                        logger.info(f"Progress: {completed_configs}/{total_configs} ({progress:.1f}%) - {len(self.planner.seen_ids)} unique cars - {elapsed:.1f}s elapsed")
+
+                async def process_page(state, page):
+                    await self.fetch_config_page(state, page, session, batches)
+
+                def dead_letter(state, page, error):
+                    self.record_dead_letter(state, page, error, dead_letters)
+
+                logger.info(f"Planned {len(configs)} configurations")
+                logger.info(f"Starting page scheduler with {self.max_concurrent} workers...")
+
+                scheduler = PageScheduler(
+                    process_page,
+                    workers=self.max_concurrent,
+                    should_start=should_start,
+                    on_finish=finish_config,
+                    on_dead_letter=dead_letter,
+                    max_attempts=self.retry_attempts,
+                    backoff_base=self.retry_backoff,
+                    backoff_max=self.retry_backoff_max,
+                    fatal_exceptions=(SoftTimeLimitExceeded,),
+                )
+                await scheduler.run(states)
+
+                incomplete_slices = list({
+                    state.config.partition
+                    for state in states
+                    if state.dead_pages or state.config.overflow
+                })
+
+            self.planner.save_history()
 
             end_time = datetime.now()
             duration = (end_time - start_time).total_seconds()
+            total_cars = len(self.planner.seen_ids)
             
             logger.info(f"Parse session completed!")
             logger.info(f"Duration: {duration:.2f} seconds ({duration/60:.1f} minutes)")
-            logger.info(f"Total unique cars found: {len(all_current_cars)}")
+            logger.info(f"Total unique cars found: {total_cars}")
             logger.info(f"Configurations completed: {completed_configs}/{total_configs}")
-            logger.info(f"Average speed: {len(all_current_cars)/duration:.1f} cars/second")
-
-            return ParseResult(
-                session_id=session_id,
-                total_cars_found=len(all_current_cars),
-                new_cars=list(all_current_cars.values()),
-                updated_cars=[],
-                removed_car_ids=set(),
-                duration_seconds=duration,
+            logger.info(f"Requests made: {self.planner.total_requests}")
+            logger.info(f"Throttle state: {self.throttle.stats}")
+            logger.info(
+                f"Downloaded {self.telemetry.bytes / 1e6:.1f} MB in {self.telemetry.requests} requests, "
+                f"p95 latency <= {self.telemetry.latency_quantile(0.95)}s, statuses: {dict(self.telemetry.statuses)}"
             )
+            if self.api.cache:
+                logger.info(f"Page cache: {self.api.cache.stats}")
+            if incomplete_slices:
+                logger.warning(
+                    f"Incomplete slices: {len(incomplete_slices)} "
+                    f"(overflow or {len(dead_letters)} unrecovered pages)"
+                )
+            logger.info(f"Average speed: {total_cars/duration:.1f} cars/second")
+
+            result.total_cars_found = total_cars
+            result.duration_seconds = duration
+            result.dead_letter_pages = dead_letters
+            result.incomplete_slices = incomplete_slices
+            result.telemetry = self.telemetry.summary()
+
+        except SoftTimeLimitExceeded:
+            # Not a crawl error: the task resumes the session from its
+            # checkpoint, which must survive.
+            await batches.put(None)
+            raise
 
         except Exception as e:
             end_time = datetime.now()
@@ -350,12 +653,8 @@ class EncarParser:
             
             logger.error(f"Parse session failed after {duration:.2f} seconds: {e}", exc_info=True)
 
-            return ParseResult(
-                session_id=session_id,
-                total_cars_found=0,
-                new_cars=[],
-                updated_cars=[],
-                removed_car_ids=set(),
-                duration_seconds=duration,
-                error_message=str(e),
-            )
\ No newline at end of file
+            result.duration_seconds = duration
+            result.error_message = str(e)
+            result.telemetry = self.telemetry.summary()
+
+        await batches.put(None)
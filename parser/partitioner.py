@@ -0,0 +1,231 @@
+import asyncio
+import logging
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import List, Tuple
+
+from ratelimit import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+MANUFACTURERS = [
+    "현대",
+    "기아",
+    "제네시스",
+    "쉐보레(GM대우)",
+    "르노코리아(삼성)",
+    "KG모빌리티(쌍용)",
+    "벤츠",
+    "BMW",
+    "아우디",
+    "폭스바겐",
+    "미니",
+    "볼보",
+    "포르쉐",
+    "랜드로버",
+    "렉서스",
+    "토요타",
+    "혼다",
+    "닛산",
+    "인피니티",
+    "포드",
+    "링컨",
+    "지프",
+    "캐딜락",
+    "크라이슬러",
+    "테슬라",
+    "푸조",
+    "시트로엥",
+    "재규어",
+    "마세라티",
+    "벤틀리",
+    "페라리",
+    "람보르기니",
+    "롤스로이스",
+    "폴스타",
+]
+
+YEAR_BOUNDS = (1950, datetime.now().year + 1)
+PRICE_BOUNDS = (0, 1_000_000)
+
+
+@dataclass(frozen=True)
+class Slice:
+    root_name: str
+    base_terms: Tuple[str, ...]
+    manufacturer: str = None
+    years: Tuple[int, int] = None
+    prices: Tuple[int, int] = None
+
+    @property
+    def terms(self):
+        terms = list(self.base_terms)
+        if self.manufacturer:
+            terms.append(f"Manufacturer.{self.manufacturer}")
+        if self.years:
+            terms.append(f"Year.range({self.years[0]}00..{self.years[1]}99)")
+        if self.prices:
+            terms.append(f"Price.range({self.prices[0]}..{self.prices[1]})")
+        return terms
+
+    @property
+    def query(self):
+        return f"q=(And.{'._.'.join(self.terms)}.)"
+
+    @property
+    def name(self):
+        parts = [self.root_name]
+        if self.manufacturer:
+            parts.append(self.manufacturer)
+        if self.years:
+            parts.append(f"Y{self.years[0]}-{self.years[1]}")
+        if self.prices:
+            parts.append(f"P{self.prices[0]}-{self.prices[1]}")
+        return "_".join(parts)
+
+    def matches(self, car):
+        if self.manufacturer and car.get("manufacturer") != self.manufacturer:
+            return False
+        year = car.get("year")
+        if self.years and year is not None:
+            if not self.years[0] * 100 <= year <= self.years[1] * 100 + 99:
+                return False
+        price = car.get("price")
+        if self.prices and price is not None:
+            if not self.prices[0] <= price <= self.prices[1]:
+                return False
+        return True
+
+
+# Disjoint searches that together cover every listing; each is partitioned
+# on its own and is the unit a shard of the distributed crawl owns.
+PARTITION_ROOTS = [
+    Slice("Hidden_N_CarType_N", ("Hidden.N", "CarType.N")),
+    Slice("Hidden_Y_CarType_N", ("Hidden.Y", "CarType.N")),
+    Slice("Hidden_N_CarType_Y", ("Hidden.N", "CarType.Y")),
+    Slice("Hidden_Y_CarType_Y", ("Hidden.Y", "CarType.Y")),
+]
+
+
+class FacetPartitioner:
+    """Splits a search expression until every slice fits one pageable window.
+
+    Slices are split by manufacturer first, then by year and price bands,
+    using the ``Count`` the API reports for each candidate slice. A split is
+    only accepted when the children's counts add up to at least the
+    parent's: the manufacturer list may miss brands and listings may lack a
+    year or price, so a shortfall falls back to the next facet instead of
+    silently dropping listings. Slices that cannot be split any further are
+    returned as overflow and crawled with several sort orders.
+    """
+
+    def __init__(
+        self,
+        api,
+        window=10000,
+        manufacturers=None,
+        year_bounds=YEAR_BOUNDS,
+        price_bounds=PRICE_BOUNDS,
+        max_concurrent=10,
+        retry_attempts=4,
+        retry_backoff=1.0,
+    ):
+        self.api = api
+        self.window = window
+        self.manufacturers = MANUFACTURERS if manufacturers is None else manufacturers
+        self.year_bounds = year_bounds
+        self.price_bounds = price_bounds
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.retry_attempts = retry_attempts
+        self.retry_backoff = retry_backoff
+        self.count_requests = 0
+
+    async def count(self, session, slice_):
+        for attempt in range(self.retry_attempts):
+            try:
+                async with self.semaphore:
+                    self.count_requests += 1
+                    data, _, _, _, _ = await self.api.search_premium_async(
+                        session, 0, 1, "ModifiedDate", slice_.query
+                    )
+                return int(data.get("Count", 0) or 0)
+            except Exception as e:
+                if attempt + 1 == self.retry_attempts:
+                    raise
+                delay = backoff_delay(attempt, self.retry_backoff)
+                logger.warning(f"{slice_.name} - Count request failed, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+
+    async def partition(self, session, roots) -> List[Tuple[Slice, int]]:
+        root_counts = await asyncio.gather(*(self.count(session, root) for root in roots))
+        results = await asyncio.gather(
+            *(self._split(session, root, count) for root, count in zip(roots, root_counts))
+        )
+        leaves = [leaf for result in results for leaf in result]
+
+        total = sum(count for _, count in leaves)
+        overflow = sum(1 for _, count in leaves if count > self.window)
+        logger.info(
+            f"Partitioned {len(roots)} roots into {len(leaves)} slices covering {total} cars "
+            f"({overflow} overflow, {self.count_requests} count requests)"
+        )
+        return leaves
+
+    async def _split_into(self, session, children, parent_count):
+        counts = await asyncio.gather(*(self.count(session, child) for child in children))
+        if sum(counts) < parent_count:
+            return None, sum(counts)
+        results = await asyncio.gather(
+            *(
+                self._split(session, child, count)
+                for child, count in zip(children, counts)
+                if count > 0
+            )
+        )
+        return [leaf for result in results for leaf in result], sum(counts)
+
+    async def _split(self, session, slice_, count):
+        if count <= self.window:
+            return [(slice_, count)]
+
+        if slice_.manufacturer is None and slice_.years is None and slice_.prices is None:
+            children = [replace(slice_, manufacturer=m) for m in self.manufacturers]
+            leaves, child_total = await self._split_into(session, children, count)
+            if leaves is not None:
+                return leaves
+            logger.info(
+                f"{slice_.name} - Manufacturers cover {child_total}/{count} cars, "
+                f"splitting by year instead"
+            )
+
+        years = slice_.years or self.year_bounds
+        if years[0] < years[1]:
+            middle = (years[0] + years[1]) // 2
+            children = [
+                replace(slice_, years=(years[0], middle)),
+                replace(slice_, years=(middle + 1, years[1])),
+            ]
+            leaves, child_total = await self._split_into(session, children, count)
+            if leaves is not None:
+                return leaves
+            logger.info(
+                f"{slice_.name} - Year bands cover {child_total}/{count} cars, splitting by price instead"
+            )
+
+        prices = slice_.prices or self.price_bounds
+        if prices[0] < prices[1]:
+            middle = (prices[0] + prices[1]) // 2
+            children = [
+                replace(slice_, prices=(prices[0], middle)),
+                replace(slice_, prices=(middle + 1, prices[1])),
+            ]
+            leaves, child_total = await self._split_into(session, children, count)
+            if leaves is not None:
+                return leaves
+            logger.warning(
+                f"{slice_.name} - Price bands cover {child_total}/{count} cars, keeping slice as overflow"
+            )
+            return [(slice_, count)]
+
+        logger.warning(f"{slice_.name} - {count} cars cannot be split further, keeping slice as overflow")
+        return [(slice_, count)]
@@ -0,0 +1,145 @@
+import json
+import logging
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ConfigYield:
+    name: str
+    pages: int = 0
+    listings: int = 0
+    new_ids: int = 0
+    low_yield_pages: int = 0
+    stopped: bool = False
+
+    @property
+    def new_per_page(self):
+        return self.new_ids / self.pages if self.pages else 0.0
+
+
+class CrawlPlanner:
+    """Orders crawl configurations by how many unseen encar_ids they add.
+
+    A configuration is cut short once several consecutive pages bring almost
+    nothing new, and the whole sweep stops when the last few completed
+    configurations stopped growing the set of known ids. Per-config yields
+    are kept between runs so that configurations which never pay off are
+    scheduled last.
+    """
+
+    def __init__(
+        self,
+        min_page_yield=0.05,
+        low_yield_patience=3,
+        min_config_yield=1.0,
+        coverage_window=12,
+        coverage_epsilon=0.002,
+        history_path=None,
+    ):
+        self.min_page_yield = min_page_yield
+        self.low_yield_patience = low_yield_patience
+        self.min_config_yield = min_config_yield
+        self.coverage_window = coverage_window
+        self.coverage_epsilon = coverage_epsilon
+        self.history_path = Path(history_path) if history_path else None
+
+        self.seen_ids: Set[str] = set()
+        self.stats: Dict[str, ConfigYield] = {}
+        self.completed_gains: List[int] = []
+        self.history = self._load_history()
+
+    def _load_history(self):
+        if not self.history_path or not self.history_path.exists():
+            return {}
+        try:
+            with open(self.history_path, "r", encoding="utf-8") as f:
+                history = json.load(f)
+            logger.info(f"Loaded crawl plan history for {len(history)} configs")
+            return history
+        except Exception as e:
+            logger.warning(f"Failed to load crawl plan history: {e}")
+            return {}
+
+    def save_history(self):
+        if not self.history_path:
+            return
+        # Shards of a distributed crawl share the history file, so entries
+        # written by the others since this planner started are kept.
+        history = {**self.history, **self._load_history()}
+        for name, stats in self.stats.items():
+            if stats.pages:
+                history[name] = {**asdict(stats), "new_per_page": stats.new_per_page}
+        try:
+            with open(self.history_path, "w", encoding="utf-8") as f:
+                json.dump(history, f, ensure_ascii=False, indent=2)
+            logger.info(f"Saved crawl plan history for {len(history)} configs")
+        except Exception as e:
+            logger.warning(f"Failed to save crawl plan history: {e}")
+
+    def plan(self, configs: Iterable[tuple], name_of) -> List[tuple]:
+        productive, unknown, unproductive = [], [], []
+        for cfg in configs:
+            previous = self.history.get(name_of(cfg))
+            if previous is None:
+                unknown.append(cfg)
+            elif previous.get("new_per_page", 0.0) >= self.min_config_yield:
+                productive.append((previous["new_per_page"], cfg))
+            else:
+                unproductive.append((previous.get("new_per_page", 0.0), cfg))
+
+        productive.sort(key=lambda item: item[0], reverse=True)
+        unproductive.sort(key=lambda item: item[0], reverse=True)
+
+        logger.info(
+            f"Crawl plan: {len(productive)} productive, {len(unknown)} unmeasured, "
+            f"{len(unproductive)} deprioritized configs"
+        )
+        return (
+            [cfg for _, cfg in productive]
+            + unknown
+            + [cfg for _, cfg in unproductive]
+        )
+
+    def record_page(self, config_name, car_ids) -> Set[str]:
+        stats = self.stats.setdefault(config_name, ConfigYield(config_name))
+        new_ids = {car_id for car_id in car_ids if car_id and car_id not in self.seen_ids}
+        self.seen_ids.update(new_ids)
+
+        stats.pages += 1
+        stats.listings += len(car_ids)
+        stats.new_ids += len(new_ids)
+
+        if car_ids and len(new_ids) / len(car_ids) < self.min_page_yield:
+            stats.low_yield_pages += 1
+        else:
+            stats.low_yield_pages = 0
+
+        if stats.low_yield_pages >= self.low_yield_patience and not stats.stopped:
+            stats.stopped = True
+            logger.info(
+                f"{config_name} - Low yield for {stats.low_yield_pages} pages, "
+                f"stopping after {stats.pages} pages ({stats.new_ids} new ids)"
+            )
+        return new_ids
+
+    def should_continue(self, config_name):
+        stats = self.stats.get(config_name)
+        return not (stats and stats.stopped)
+
+    def finish_config(self, config_name):
+        stats = self.stats.get(config_name)
+        self.completed_gains.append(stats.new_ids if stats else 0)
+
+    def coverage_flattened(self):
+        if len(self.completed_gains) < self.coverage_window or not self.seen_ids:
+            return False
+        recent_gain = sum(self.completed_gains[-self.coverage_window:])
+        return recent_gain <= self.coverage_epsilon * len(self.seen_ids)
+
+    @property
+    def total_requests(self):
+        return sum(stats.pages for stats in self.stats.values())
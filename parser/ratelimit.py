@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_STATUSES = {429, 503}
+
+
+def backoff_delay(attempt, base=1.0, maximum=30.0):
+    delay = min(maximum, base * (2 ** attempt))
+    return random.uniform(delay / 2, delay)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease limit on in-flight requests.
+
+    The limit grows by one after a full window of successful responses and is
+    cut by ``decrease_factor`` on throttling, server errors or when the p95
+    latency of recent requests exceeds ``latency_target``. Cuts are spaced by
+    ``cooldown`` seconds so a burst of failures from one congested moment
+    counts once.
+    """
+
+    def __init__(
+        self,
+        initial,
+        maximum,
+        minimum=1,
+        decrease_factor=0.5,
+        latency_target=5.0,
+        latency_window=100,
+        cooldown=2.0,
+    ):
+        self.limit = float(min(initial, maximum))
+        self.maximum = maximum
+        self.minimum = minimum
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.latencies = deque(maxlen=latency_window)
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.successes = 0
+        self.last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def latency_p95(self):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def on_success(self, latency):
+        self.latencies.append(latency)
+        if len(self.latencies) >= self.latencies.maxlen // 2 and self.latency_p95() > self.latency_target:
+            return self.on_congestion(f"p95 latency {self.latency_p95():.2f}s")
+
+        self.successes += 1
+        if self.successes >= self.limit and self.limit < self.maximum:
+            self.successes = 0
+            self.limit = min(self.maximum, self.limit + 1)
+            logger.debug(f"Concurrency limit raised to {int(self.limit)}")
+        return False
+
+    def on_congestion(self, reason):
+        now = time.monotonic()
+        self.successes = 0
+        if now - self.last_decrease < self.cooldown:
+            return False
+        self.last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+        self.latencies.clear()
+        logger.warning(f"Concurrency limit lowered to {int(self.limit)} ({reason})")
+        return True
+
+
+class AdaptiveThrottle:
+    """Pairs a token bucket with an AIMD concurrency limit.
+
+    ``max_concurrent`` and ``request_delay`` are both the starting point and
+    the ceiling: the crawl begins at full speed, backs off when the upstream
+    pushes back and climbs back to the configured limits once it recovers.
+    """
+
+    def __init__(self, max_concurrent=10, request_delay=0.03, latency_target=5.0, min_rate=0.5):
+        self.max_rate = 1 / request_delay if request_delay > 0 else float("inf")
+        self.min_rate = min(min_rate, self.max_rate)
+        self.bucket = TokenBucket(self.max_rate) if request_delay > 0 else None
+        self.concurrency = AIMDController(
+            max_concurrent, max_concurrent, latency_target=latency_target
+        )
+
+    async def __aenter__(self):
+        await self.concurrency.acquire()
+        if self.bucket:
+            try:
+                await self.bucket.acquire()
+            except BaseException:
+                await self.concurrency.release()
+                raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.concurrency.release()
+        return False
+
+    def record(self, status, latency, retry_after=None):
+        if status is not None and status < 400:
+            self.concurrency.on_success(latency)
+            if self.bucket and self.bucket.rate < self.max_rate:
+                self.bucket.rate = min(self.max_rate, self.bucket.rate + self.max_rate / 100)
+            return
+
+        if status is None or status in THROTTLE_STATUSES or status >= 500:
+            reason = f"HTTP {status}" if status else "request error"
+            if self.concurrency.on_congestion(reason) and self.bucket:
+                self.bucket.rate = max(self.min_rate, self.bucket.rate * 0.5)
+                logger.warning(f"Request rate lowered to {self.bucket.rate:.1f}/s")
+            if retry_after and self.bucket:
+                self.bucket.pause(retry_after)
+
+    @property
+    def stats(self):
+        return {
+            "concurrency_limit": int(self.concurrency.limit),
+            "request_rate": self.bucket.rate if self.bucket else None,
+            "latency_p95": self.concurrency.latency_p95(),
+        }
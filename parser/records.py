@@ -0,0 +1,127 @@
+import logging
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter
+
+logger = logging.getLogger(__name__)
+
+# (record field, API field, default); list defaults are tuples so the same
+# default object can be shared by every record.
+CAR_FIELDS = (
+    ("encar_id", "Id", ""),
+    ("manufacturer", "Manufacturer", ""),
+    ("model", "Model", ""),
+    ("badge", "Badge", ""),
+    ("badge_detail", "BadgeDetail", ""),
+    ("transmission", "Transmission", ""),
+    ("fuel_type", "FuelType", ""),
+    ("year", "Year", None),
+    ("form_year", "FormYear", ""),
+    ("mileage", "Mileage", None),
+    ("price", "Price", None),
+    ("separation", "Separation", ()),
+    ("trust", "Trust", ()),
+    ("service_mark", "ServiceMark", ()),
+    ("condition", "Condition", ()),
+    ("photo", "Photo", ""),
+    ("photos", "Photos", ()),
+    ("service_copy_car", "ServiceCopyCar", ""),
+    ("sales_status", "SalesStatus", ""),
+    ("sell_type", "SellType", ""),
+    ("buy_type", "BuyType", ()),
+    ("powerpack", "Powerpack", ""),
+    ("ad_words", "AdWords", ""),
+    ("hotmark", "Hotmark", ""),
+    ("office_city_state", "OfficeCityState", ""),
+    ("office_name", "OfficeName", ""),
+    ("dealer_name", "DealerName", ""),
+)
+
+FIELD_NAMES = tuple(name for name, _, _ in CAR_FIELDS) + ("modified_date",)
+_SOURCES = tuple(source for _, source, _ in CAR_FIELDS)
+_DEFAULTS = tuple(default for _, _, default in CAR_FIELDS)
+_INDEX = {name: i for i, name in enumerate(FIELD_NAMES)}
+_read_listing = attrgetter(*_SOURCES, "ModifiedDate")
+
+
+class CarRecord(namedtuple("CarRecord", FIELD_NAMES)):
+    """Normalized listing stored as a tuple.
+
+    Fields can be read by attribute or by name (``car["price"]``,
+    ``car.get("price")``), and ``keys``/``items`` make ``Car(**car)`` work,
+    but iterating a record yields its values like any tuple. Use
+    ``as_dict`` where a real dict is needed, e.g. for JSON output.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            return tuple.__getitem__(self, _INDEX[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        index = _INDEX.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        return FIELD_NAMES
+
+    def items(self):
+        return zip(FIELD_NAMES, self)
+
+    def as_dict(self):
+        return dict(zip(FIELD_NAMES, self))
+
+
+@lru_cache(maxsize=65536)
+def parse_modified_date(value):
+    try:
+        if "+" in value:
+            date_part = value.split("+")[0].strip()
+        elif "-" in value[-3:]:
+            date_part = "-".join(value.split("-")[:-1]).strip()
+        else:
+            date_part = value.strip()
+
+        if "." in date_part:
+            date_part = date_part.split(".")[0]
+
+        return datetime.strptime(date_part, "%Y-%m-%d %H:%M:%S")
+    except Exception as e:
+        logger.warning(f"Failed to parse date '{value}': {e}")
+        return None
+
+
+def listing_id(car_data):
+    if car_data.__class__ is dict:
+        return str(car_data.get("Id", ""))
+    return str(car_data.Id)
+
+
+def normalize_car(car_data):
+    """Builds a ``CarRecord`` from one search result.
+
+    ``car_data`` is either the listing dict from the API or an object with
+    the API field names as attributes, such as ``decoding.Listing``.
+    """
+    if car_data.__class__ is dict:
+        get = car_data.get
+        values = list(map(get, _SOURCES, _DEFAULTS))
+        modified_date = get("ModifiedDate")
+    else:
+        values = list(_read_listing(car_data))
+        modified_date = values.pop()
+    values[0] = str(values[0])
+    values.append(parse_modified_date(modified_date) if modified_date else None)
+    return tuple.__new__(CarRecord, values)
+
+
+def record_from_dict(data):
+    """Rebuilds a ``CarRecord`` from ``as_dict`` output that went through JSON."""
+    values = list(map(data.get, FIELD_NAMES))
+    modified_date = values[-1]
+    if modified_date.__class__ is str:
+        values[-1] = datetime.fromisoformat(modified_date)
+    return tuple.__new__(CarRecord, values)
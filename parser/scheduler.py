@@ -0,0 +1,208 @@
+import asyncio
+import itertools
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Set
+
+from ratelimit import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(eq=False)
+class ConfigState:
+    config: Any
+    index: int
+    max_pages: int
+    next_page: int = 0
+    in_flight: int = 0
+    pages_fetched: int = 0
+    cars_added: int = 0
+    total_count: Optional[int] = None
+    consecutive_failures: int = 0
+    consecutive_empty_pages: int = 0
+    consecutive_duplicate_pages: int = 0
+    last_page_signature: Optional[str] = None
+    dead_pages: List[int] = field(default_factory=list)
+    done_pages: Set[int] = field(default_factory=set)
+    stopped: bool = False
+    finished: bool = False
+
+    @property
+    def has_more_pages(self):
+        return not self.stopped and self.next_page < self.max_pages
+
+    @property
+    def is_done(self):
+        return self.in_flight == 0 and not self.has_more_pages
+
+
+class PageScheduler:
+    """Runs page fetches from many configs on a fixed pool of workers.
+
+    At most ``max_active`` configs are in progress at a time and a new one is
+    admitted as soon as another finishes. Every config starts with its first
+    page; once that page reports the total count, further pages are kept
+    queued: ``lookahead`` per config, or more when too few configs are active
+    to keep every worker busy. Jobs are prioritised by config order and page
+    number, so configs finish roughly in plan order while idle workers pick up
+    pages from later configs instead of waiting for the slowest config in a
+    batch.
+
+    A page whose job raises is put back on the queue after an exponential
+    backoff with jitter; after ``max_attempts`` it is handed to
+    ``on_dead_letter`` instead. Pages in a config's ``done_pages`` are never
+    queued, which is how a resumed crawl skips what it already checkpointed.
+    An exception in ``fatal_exceptions`` is never retried: it stops the run
+    and is re-raised by ``run``.
+    """
+
+    def __init__(
+        self,
+        process_page,
+        workers=10,
+        lookahead=2,
+        max_active=None,
+        should_start=None,
+        on_finish=None,
+        on_dead_letter=None,
+        max_attempts=4,
+        backoff_base=1.0,
+        backoff_max=30.0,
+        fatal_exceptions=(),
+    ):
+        self.process_page = process_page
+        self.workers = workers
+        self.lookahead = lookahead
+        self.max_active = max_active or workers
+        self.should_start = should_start
+        self.on_finish = on_finish
+        self.on_dead_letter = on_dead_letter
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.fatal_exceptions = fatal_exceptions
+        self._fatal = None
+        self._sequence = itertools.count()
+        self._pending = iter(())
+        self._active = 0
+        self._outstanding = 0
+        self._idle = None
+        self._retry_handles = set()
+
+    async def run(self, states):
+        queue = asyncio.PriorityQueue()
+        self._pending = iter(states)
+        self._active = 0
+        self._outstanding = 0
+        self._idle = asyncio.Event()
+        self._fatal = None
+        self._admit(queue)
+        if self._outstanding == 0:
+            return
+
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.workers)]
+        try:
+            await self._idle.wait()
+        finally:
+            for handle in self._retry_handles:
+                handle.cancel()
+            self._retry_handles.clear()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        if self._fatal is not None:
+            raise self._fatal
+
+    def _admit(self, queue):
+        while self._active < self.max_active:
+            state = next(self._pending, None)
+            if state is None:
+                return
+            self._active += 1
+            self._top_up(queue, state)
+            if state.is_done:
+                # Resumed config whose pages were all checkpointed already.
+                self._finish(state)
+
+    def _finish(self, state):
+        state.finished = True
+        self._active -= 1
+        if self.on_finish:
+            try:
+                self.on_finish(state)
+            except Exception as e:
+                logger.error(f"Finishing config #{state.index} failed: {e}", exc_info=True)
+
+    def _dead_letter(self, state, page, error):
+        if self.on_dead_letter:
+            try:
+                self.on_dead_letter(state, page, error)
+            except Exception as e:
+                logger.error(f"Dead-lettering page {page} of config #{state.index} failed: {e}", exc_info=True)
+
+    def _top_up(self, queue, state):
+        if state.total_count is None:
+            limit = 1
+        else:
+            limit = max(self.lookahead, math.ceil(self.workers / max(self._active, 1)))
+        while state.has_more_pages and state.in_flight < limit:
+            page = state.next_page
+            state.next_page += 1
+            if page in state.done_pages:
+                continue
+            self._outstanding += 1
+            queue.put_nowait((state.index, page, next(self._sequence), 0, state))
+            state.in_flight += 1
+
+    def _schedule_retry(self, queue, state, page, attempt):
+        item = (state.index, page, next(self._sequence), attempt, state)
+        delay = backoff_delay(attempt - 1, self.backoff_base, self.backoff_max)
+        self._outstanding += 1
+
+        def requeue():
+            self._retry_handles.discard(handle)
+            queue.put_nowait(item)
+
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._retry_handles.add(handle)
+        return delay
+
+    async def _worker(self, queue):
+        while True:
+            _, page, _, attempt, state = await queue.get()
+            retried = False
+            try:
+                if state.stopped:
+                    continue
+                if page == 0 and attempt == 0 and self.should_start and not self.should_start(state):
+                    state.stopped = True
+                    continue
+                await self.process_page(state, page)
+            except self.fatal_exceptions as e:
+                self._fatal = e
+                self._idle.set()
+                return
+            except Exception as e:
+                if attempt + 1 < self.max_attempts:
+                    delay = self._schedule_retry(queue, state, page, attempt + 1)
+                    retried = True
+                    logger.warning(
+                        f"Page {page} of config #{state.index} failed (attempt {attempt + 1}/{self.max_attempts}), "
+                        f"retrying in {delay:.1f}s: {e}"
+                    )
+                else:
+                    logger.error(f"Page {page} of config #{state.index} failed after {self.max_attempts} attempts: {e}")
+                    self._dead_letter(state, page, e)
+            finally:
+                if not retried:
+                    state.in_flight -= 1
+                    self._top_up(queue, state)
+                    if state.is_done and not state.finished:
+                        self._finish(state)
+                        self._admit(queue)
+                queue.task_done()
+                self._outstanding -= 1
+                if self._outstanding == 0:
+                    self._idle.set()
@@ -0,0 +1,128 @@
+import gzip
+import json
+import logging
+import shutil
+from dataclasses import asdict
+from pathlib import Path
+
+import redis
+from redis import asyncio as aioredis
+
+from partitioner import Slice
+from records import record_from_dict
+
+logger = logging.getLogger(__name__)
+
+
+class RedisDedup:
+    """Session-wide claims on encar_ids shared by all crawl shards.
+
+    ``claim`` records ``owner`` as the claimant of each id no other shard has
+    claimed yet and returns the ids ``owner`` holds, so every listing reaches
+    the reducer only once no matter how many workers saw it. Claiming again
+    is idempotent for the same owner: a page retried after a failed call or
+    refetched after a resume gets its ids back instead of losing them. The
+    hash expires ``ttl`` seconds after the last write.
+    """
+
+    def __init__(self, url, session_id, owner, ttl=86400):
+        self.client = aioredis.Redis.from_url(url)
+        self.key = dedup_key(session_id)
+        self.owner = owner
+        self.ttl = ttl
+
+    async def claim(self, car_ids):
+        if not car_ids:
+            return set()
+        pipe = self.client.pipeline(transaction=False)
+        for car_id in car_ids:
+            pipe.hsetnx(self.key, car_id, self.owner)
+        pipe.hmget(self.key, car_ids)
+        pipe.expire(self.key, self.ttl)
+        owners = (await pipe.execute())[-2]
+        return {
+            car_id for car_id, owner in zip(car_ids, owners)
+            if owner is not None and owner.decode() == self.owner
+        }
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def dedup_key(session_id):
+    return f"encar:crawl:{session_id}:seen"
+
+
+def drop_dedup(url, session_id):
+    client = redis.Redis.from_url(url)
+    try:
+        client.delete(dedup_key(session_id))
+    except redis.RedisError as e:
+        logger.warning(f"Failed to drop dedup set for session {session_id}: {e}")
+    finally:
+        client.close()
+
+
+class ShardSpool:
+    """Gzip-compressed JSON lines file holding the cars one shard claimed.
+
+    Shards run on any worker, so ``directory`` has to be on storage every
+    worker and the reducer can reach.
+    """
+
+    def __init__(self, directory, shard):
+        self.path = Path(directory) / f"{shard}.jsonl.gz"
+        self.count = 0
+        self._file = None
+
+    def write_batch(self, batch):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+        for car_data in batch:
+            self._file.write(json.dumps(car_data.as_dict(), ensure_ascii=False, default=str))
+            self._file.write('\n')
+        self.count += len(batch)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def shard_dir(data_dir, session_id):
+    return Path(data_dir) / "shards" / session_id
+
+
+def read_spools(directory, batch_size=500):
+    """Yields the cars of every spool in ``directory`` as ``CarRecord`` batches."""
+    batch = []
+    for path in sorted(Path(directory).glob("*.jsonl.gz")):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                batch.append(record_from_dict(json.loads(line)))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+def remove_spools(directory):
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def slice_to_dict(slice_):
+    return asdict(slice_) if slice_ is not None else None
+
+
+def slice_from_dict(data):
+    if data is None:
+        return None
+    return Slice(
+        data['root_name'],
+        tuple(data['base_terms']),
+        data['manufacturer'],
+        tuple(data['years']) if data['years'] else None,
+        tuple(data['prices']) if data['prices'] else None,
+    )
@@ -0,0 +1,114 @@
+import gzip
+import io
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SNAPSHOT_PREFIXES = ("new_cars_", "updated_cars_", "removed_cars_")
+
+
+def _open_zstd(path, mode):
+    if "w" in mode:
+        raw = zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"), closefd=True)
+    else:
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return io.TextIOWrapper(raw, encoding="utf-8")
+
+
+CODECS = {
+    ".zst": _open_zstd if zstandard is not None else None,
+    ".gz": lambda path, mode: gzip.open(path, mode + "t", encoding="utf-8"),
+}
+
+
+def snapshot_suffix(codec="auto"):
+    """File suffix of the snapshot codec, ``.ndjson.zst`` when zstandard is
+    installed and ``.ndjson.gz`` otherwise."""
+    if codec == "auto":
+        codec = "zst" if CODECS[".zst"] is not None else "gz"
+    if CODECS.get(f".{codec}") is None:
+        logger.warning(f"Snapshot codec '{codec}' is not available, falling back to gz")
+        codec = "gz"
+    return f".ndjson.{codec}"
+
+
+def open_snapshot(path, mode="r"):
+    opener = CODECS.get(Path(path).suffix)
+    if opener is None:
+        raise ValueError(f"No codec available for snapshot {path}")
+    return opener(path, mode)
+
+
+class SnapshotWriter:
+    """Streams items to a compressed NDJSON file, one JSON value per line.
+
+    The first line is ``{"_meta": header}`` and ``close`` may append a
+    ``{"_summary": ...}`` line. The file is written under a temporary name
+    and only moved into place by ``close``, so a failed run never replaces
+    the previous file. Nothing is written for a snapshot without items.
+    """
+
+    def __init__(self, path, header):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + '.tmp' + self.path.suffix)
+        self.header = header
+        self.count = 0
+        self._file = None
+
+    def write(self, item):
+        if self._file is None:
+            self._file = open_snapshot(self.tmp_path, 'w')
+            self._write_line({'_meta': self.header})
+        self._write_line(item)
+        self.count += 1
+
+    def _write_line(self, item):
+        self._file.write(json.dumps(item, ensure_ascii=False, default=str))
+        self._file.write('\n')
+
+    def close(self, **summary):
+        if self._file is None:
+            return False
+        if summary:
+            self._write_line({'_summary': summary})
+        self._file.close()
+        self._file = None
+        os.replace(self.tmp_path, self.path)
+        logger.info(f"Successfully saved {self.count} items to {self.path.name}")
+        return True
+
+    def discard(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self.tmp_path.unlink(missing_ok=True)
+
+
+def prune_snapshots(directory, retention_days):
+    """Deletes timestamped change files older than ``retention_days``.
+
+    ``current_cars`` snapshots are never pruned; a retention of 0 keeps
+    everything.
+    """
+    if not retention_days:
+        return 0
+    cutoff = time.time() - retention_days * 86400
+    removed = 0
+    for path in Path(directory).iterdir():
+        if not path.name.startswith(SNAPSHOT_PREFIXES) or not path.is_file():
+            continue
+        if path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+            removed += 1
+    if removed:
+        logger.info(f"Pruned {removed} change files older than {retention_days} days")
+    return removed
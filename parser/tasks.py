@@ -1,13 +1,33 @@
-import json
+import uuid
 import asyncio
 import logging
-from pathlib import Path
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+
+import redis
+from celery import chord
+from celery.exceptions import SoftTimeLimitExceeded
+from sqlalchemy import exists, func
 
 from celery_app import celery_app
+from checkpoint import CrawlCheckpoint, drop_checkpoint
+from config import config
 from database import get_db_session, create_tables
 from models import Car, ParseSession
-from parser import EncarParser
+from ingest import CarWriter, DeltaCarWriter, ensure_content_hashes, rehash_cars
+from page_cache import PageCache
+from parser import EncarParser, ParseResult, shard_names
+from planner import CrawlPlanner
+from telemetry import start_metrics_server
+from sharding import (
+    RedisDedup,
+    ShardSpool,
+    drop_dedup,
+    read_spools,
+    remove_spools,
+    shard_dir,
+    slice_from_dict,
+    slice_to_dict,
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,264 +35,496 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def save_json_data(data, filename):
-    filepath = Path(f"/app/{filename}")
-    logger.info(f"Saving data to {filepath}")
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
-    logger.info(f"Successfully saved {len(data.get('cars', []))} cars to {filename}")
+# The backend keys its /cars response cache on this counter, so it is
+# bumped after every commit that changes the cars table.
+CARS_GENERATION_KEY = "encar:cars:generation"
 
-def load_previous_cars():
-    filepath = Path("/app/current_cars.json")
-    logger.info(f"Loading previous cars from {filepath}")
-    
-    if not filepath.exists():
-        logger.info("No previous cars file found - this might be the first run")
-        return {}
-    
+def bump_cars_generation():
+    client = redis.Redis.from_url(config.REDIS_URL)
+    try:
+        client.incr(CARS_GENERATION_KEY)
+    except redis.RedisError as e:
+        logger.warning(f"Failed to bump cars cache generation: {e}")
+    finally:
+        client.close()
+
+def latest_watermark(db_session):
+    return db_session.query(func.max(ParseSession.max_modified_date)).filter(
+        ParseSession.status == 'completed'
+    ).scalar()
+
+def session_watermark(parse_result, writer):
+    # A crawl with unrecovered pages may have missed newer listings, so it
+    # must not move the watermark past them.
+    if parse_result.has_unrecovered_pages:
+        return None
+    return writer.max_modified_date
+
+def resume_cutoff():
+    return datetime.now(timezone.utc) - timedelta(seconds=config.CHECKPOINT_TTL)
+
+def resumable_session(db_session):
+    return db_session.query(ParseSession).filter(
+        ParseSession.status == 'running',
+        ParseSession.mode == 'full',
+        ParseSession.started_at >= resume_cutoff()
+    ).order_by(ParseSession.started_at.desc()).first()
+
+def drop_session_state(session_id):
+    drop_checkpoint(config.REDIS_URL, session_id)
+    drop_dedup(config.REDIS_URL, session_id)
+    remove_spools(shard_dir(config.DATA_DIR, session_id))
+
+def fail_abandoned_sessions(db_session):
+    """Fails sessions still 'running' after ``CHECKPOINT_TTL``.
+
+    Their worker was killed, or they ran out of resumes, without getting to
+    mark them failed; their checkpoints can no longer be resumed.
+    """
+    abandoned = db_session.query(ParseSession).filter(
+        ParseSession.status == 'running',
+        ParseSession.started_at < resume_cutoff()
+    ).all()
+    for parse_session in abandoned:
+        logger.warning(f"Failing parse session {parse_session.session_id} abandoned since {parse_session.started_at}")
+        parse_session.status = 'failed'
+        parse_session.completed_at = datetime.now(timezone.utc)
+        parse_session.error_message = f"abandoned: still running after {config.CHECKPOINT_TTL}s"
+        drop_session_state(parse_session.session_id)
+    db_session.commit()
+
+def fail_session(session_id, error):
+    """Marks a session that ended without completing as failed and drops
+    its checkpoint, so it is neither resumed nor left 'running'."""
+    if session_id is None:
+        return
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        cars = {car['encar_id']: car for car in data.get('cars', [])}
-        logger.info(f"Loaded {len(cars)} previous cars")
-        return cars
+        with get_db_session() as db_session:
+            db_session.query(ParseSession).filter(
+                ParseSession.session_id == session_id,
+                ParseSession.status == 'running'
+            ).update({
+                'status': 'failed',
+                'completed_at': datetime.now(timezone.utc),
+                'error_message': error,
+            }, synchronize_session=False)
     except Exception as e:
-        logger.error(f"Failed to load previous cars: {e}")
-        return {}
+        logger.error(f"Failed to mark parse session {session_id} as failed: {e}")
+    drop_checkpoint(config.REDIS_URL, session_id)
 
-def calculate_differences(current_cars, previous_cars):
-    logger.info(f"Calculating differences between {len(current_cars)} current and {len(previous_cars)} previous cars")
+def build_page_cache(strategy):
+    # Cache keys hold no watermark, so a delta crawl would replay the pages
+    # of the previous delta instead of fetching newer listings.
+    if strategy == 'delta':
+        return None
+    page_cache = PageCache(config.PAGE_CACHE_DIR, config.PAGE_CACHE_MODE, config.PAGE_CACHE_TTL)
+    page_cache.purge_expired()
+    return page_cache
+
+def build_parser(planner=None, strategy=None, modified_since=None, shard=None, dedup=None, checkpoint=None):
+    start_metrics_server(config.METRICS_PORT)
+    strategy = strategy or config.CRAWL_STRATEGY
+    return EncarParser(
+        max_concurrent=config.MAX_CONCURRENT_REQUESTS,
+        request_delay=config.REQUEST_DELAY,
+        latency_target=config.LATENCY_TARGET,
+        planner=planner,
+        strategy=strategy,
+        partition_window=config.PARTITION_WINDOW,
+        retry_attempts=config.PAGE_RETRY_ATTEMPTS,
+        retry_backoff=config.PAGE_RETRY_BACKOFF,
+        retry_backoff_max=config.PAGE_RETRY_BACKOFF_MAX,
+        json_decoder=config.JSON_DECODER,
+        page_cache=build_page_cache(strategy),
+        modified_since=modified_since,
+        shard=shard,
+        dedup=dedup,
+        checkpoint=checkpoint,
+    )
+
+async def stream_to_writer(parser, parse_result, writer):
+    try:
+        async for batch in parser.iter_page_batches(parse_result, config.MAX_PENDING_BATCHES):
+            await asyncio.to_thread(writer.write_batch, batch)
+    finally:
+        await parser.close()
+
+def build_planner():
+    return CrawlPlanner(
+        min_page_yield=config.PLANNER_MIN_PAGE_YIELD,
+        low_yield_patience=config.PLANNER_LOW_YIELD_PATIENCE,
+        min_config_yield=config.PLANNER_MIN_CONFIG_YIELD,
+        coverage_window=config.PLANNER_COVERAGE_WINDOW,
+        coverage_epsilon=config.PLANNER_COVERAGE_EPSILON,
+        history_path=config.CRAWL_PLAN_PATH,
+    )
+
+def open_writer(db_session, parse_session):
+    ensure_content_hashes(db_session)
     
-    current_ids = set(current_cars.keys())
-    previous_ids = set(previous_cars.keys())
+    logger.info("Checking for existing cars in database")
+    is_first_run = not db_session.query(exists().where(Car.is_active == True)).scalar()
     
-    new_car_ids = current_ids - previous_ids
-    new_cars = [current_cars[car_id] for car_id in new_car_ids]
+    if is_first_run:
+        logger.info("First run detected - adding all cars as new")
+    else:
+        logger.info("Incremental update - diffing against the cars table")
     
-    removed_car_ids = previous_ids - current_ids
+    writer = CarWriter(
+        db_session,
+        parse_session,
+        is_first_run,
+        output_dir=config.DATA_DIR,
+    )
+    return writer, is_first_run
+
+def complete_session(parse_session, parse_result, writer):
+    writer.finish(parse_result)
     
-    updated_cars = []
-    common_ids = current_ids & previous_ids
+    logger.info("Updating parse session with final results")
+    parse_session.completed_at = datetime.now(timezone.utc)
+    parse_session.status = 'completed'
+    parse_session.total_cars_found = parse_result.total_cars_found
+    parse_session.new_cars_added = writer.new_count
+    parse_session.cars_updated = writer.updated_count
+    parse_session.cars_removed = writer.removed_count
+    parse_session.dead_letter_pages = parse_result.dead_letter_pages
+    parse_session.max_modified_date = session_watermark(parse_result, writer)
+    parse_session.telemetry = parse_result.telemetry
+
+def session_summary(parse_result, writer, is_first_run):
+    return {
+        'status': 'completed',
+        'session_id': parse_result.session_id,
+        'total_cars_found': parse_result.total_cars_found,
+        'new_cars_added': writer.new_count,
+        'cars_updated': writer.updated_count,
+        'cars_removed': writer.removed_count,
+        'duration_seconds': parse_result.duration_seconds,
+        'dead_letter_pages': len(parse_result.dead_letter_pages),
+        'is_first_run': is_first_run
+    }
+
+@celery_app.task(bind=True, name='tasks.parse_encar_data', acks_late=True, reject_on_worker_lost=True)
+def parse_encar_data(self, session_id=None):
+    if config.DISTRIBUTED_CRAWL:
+        return dispatch_sharded_crawl()
     
-    logger.info(f"Found {len(new_car_ids)} new cars, {len(removed_car_ids)} removed cars, checking {len(common_ids)} for updates")
+    logger.info("Starting Encar data parsing task")
     
-    for car_id in common_ids:
-        current_car = current_cars[car_id]
-        previous_car = previous_cars[car_id]
+    try:
+        logger.info("Creating database tables if they don't exist")
+        create_tables()
+        logger.info("Database tables ready")
         
-        fields_to_compare = ['price', 'mileage', 'sales_status', 'modified_date', 'office_city_state', 'office_name', 'dealer_name']
+        with get_db_session() as db_session:
+            fail_abandoned_sessions(db_session)
+            if session_id:
+                parse_session = db_session.query(ParseSession).filter(ParseSession.session_id == session_id).one()
+            else:
+                parse_session = resumable_session(db_session)
+            
+            if parse_session is None:
+                logger.info("Creating parse session record")
+                parse_session = ParseSession(
+                    session_id=str(uuid.uuid4()),
+                    started_at=datetime.now(timezone.utc),
+                    status='running'
+                )
+                db_session.add(parse_session)
+                db_session.commit()
+            else:
+                logger.info(f"Resuming interrupted parse session {parse_session.session_id}")
+            
+            session_id = parse_session.session_id
+            parse_result = ParseResult(session_id=session_id)
+            
+            logger.info("Initializing parser")
+            checkpoint = CrawlCheckpoint(config.REDIS_URL, session_id, ttl=config.CHECKPOINT_TTL)
+            parser = build_parser(build_planner(), checkpoint=checkpoint)
+            
+            writer, is_first_run = open_writer(db_session, parse_session)
+            
+            logger.info("Starting data parsing from Encar API")
+            asyncio.run(stream_to_writer(parser, parse_result, writer))
+            
+            if parse_result.error_message:
+                logger.error(f"Parsing failed: {parse_result.error_message}")
+                writer.discard()
+                db_session.rollback()
+                parse_session.status = 'failed'
+                parse_session.completed_at = datetime.now(timezone.utc)
+                parse_session.error_message = parse_result.error_message
+                drop_checkpoint(config.REDIS_URL, session_id)
+                return {
+                    'status': 'failed', 
+                    'error': parse_result.error_message, 
+                    'session_id': parse_result.session_id
+                }
+            
+            logger.info(f"Parsing completed successfully in {parse_result.duration_seconds:.2f} seconds")
+            logger.info(f"Found {parse_result.total_cars_found} total unique cars")
+            
+            complete_session(parse_session, parse_result, writer)
+            
+            logger.info("Completing parse session")
+            db_session.commit()
         
-        has_changes = False
-        changes = {}
+        drop_checkpoint(config.REDIS_URL, session_id)
+        bump_cars_generation()
+        result = session_summary(parse_result, writer, is_first_run)
         
-        for field in fields_to_compare:
-            current_value = current_car.get(field)
-            previous_value = previous_car.get(field)
-            
-            if current_value != previous_value:
-                has_changes = True
-                changes[field] = {'old': previous_value, 'new': current_value}
+        logger.info("Task completed successfully!")
+        logger.info(f"Final summary: {result}")
         
-        if has_changes:
-            current_car['changes'] = changes
-            updated_cars.append(current_car)
-    
-    logger.info(f"Found {len(updated_cars)} updated cars")
-    return new_cars, updated_cars, removed_car_ids
+        return result
+        
+    except SoftTimeLimitExceeded as e:
+        if self.request.retries >= config.CRAWL_MAX_RESUMES:
+            error = f"soft time limit exceeded after {self.request.retries} resumes"
+            logger.error(f"Session {session_id} failed: {error}")
+            fail_session(session_id, error)
+            return {'status': 'failed', 'error': error, 'session_id': session_id}
+        logger.warning(f"Soft time limit reached - resuming session {session_id} from its checkpoint")
+        raise self.retry(
+            kwargs={'session_id': session_id},
+            exc=e,
+            countdown=config.CRAWL_RESUME_DELAY,
+            max_retries=config.CRAWL_MAX_RESUMES,
+        )
+        
+    except Exception as e:
+        logger.error(f"Task failed with error: {e}", exc_info=True)
+        fail_session(session_id, str(e))
+        return {'status': 'failed', 'error': str(e), 'session_id': session_id}
 
-@celery_app.task(bind=True, name='tasks.parse_encar_data')
-def parse_encar_data(self):
-    logger.info("Starting Encar data parsing task")
+def dispatch_sharded_crawl():
+    logger.info("Starting distributed Encar crawl")
     
     try:
-        logger.info("Creating database tables if they don't exist")
         create_tables()
-        logger.info("Database tables ready")
+        shards = shard_names(config.CRAWL_STRATEGY)
+        session_id = str(uuid.uuid4())
+        
+        with get_db_session() as db_session:
+            fail_abandoned_sessions(db_session)
+            db_session.add(ParseSession(
+                session_id=session_id,
+                started_at=datetime.now(timezone.utc),
+                status='running'
+            ))
+        
+        chord(
+            parse_encar_shard.s(session_id, shard) for shard in shards
+        )(reduce_encar_shards.s(session_id))
         
-        logger.info("Initializing parser")
-        parser = EncarParser()
+        logger.info(f"Dispatched {len(shards)} shards for session {session_id}: {shards}")
+        return {'status': 'dispatched', 'session_id': session_id, 'shards': shards}
+        
+    except Exception as e:
+        logger.error(f"Dispatching distributed crawl failed: {e}", exc_info=True)
+        return {'status': 'failed', 'error': str(e)}
+
+async def spool_shard(parser, parse_result, spool):
+    try:
+        await stream_to_writer(parser, parse_result, spool)
+    finally:
+        spool.close()
+
+@celery_app.task(bind=True, name='tasks.parse_encar_shard', acks_late=True, reject_on_worker_lost=True)
+def parse_encar_shard(self, session_id, shard):
+    logger.info(f"Starting shard {shard} of session {session_id}")
+    
+    try:
+        dedup = RedisDedup(config.REDIS_URL, session_id, shard, ttl=config.SHARD_DEDUP_TTL)
+        checkpoint = CrawlCheckpoint(config.REDIS_URL, session_id, scope=shard, ttl=config.CHECKPOINT_TTL)
+        parser = build_parser(build_planner(), shard=shard, dedup=dedup, checkpoint=checkpoint)
+        parse_result = ParseResult(session_id=session_id)
+        spool = ShardSpool(shard_dir(config.DATA_DIR, session_id), shard)
         
-        logger.info("Starting data parsing from Encar API")
-        parse_result = asyncio.run(parser.parse_all_configurations())
+        asyncio.run(spool_shard(parser, parse_result, spool))
         
-        if parse_result.error_message:
-            logger.error(f"Parsing failed: {parse_result.error_message}")
-            return {
-                'status': 'failed', 
-                'error': parse_result.error_message, 
-                'session_id': parse_result.session_id
-            }
+        logger.info(f"Shard {shard} claimed {spool.count} cars in {parse_result.duration_seconds:.2f} seconds")
+        return {
+            'shard': shard,
+            'error': parse_result.error_message,
+            'cars_claimed': spool.count,
+            'duration_seconds': parse_result.duration_seconds,
+            'dead_letter_pages': parse_result.dead_letter_pages,
+            'telemetry': parse_result.telemetry,
+            'incomplete_slices': [slice_to_dict(slice_) for slice_ in parse_result.incomplete_slices],
+        }
         
-        logger.info(f"Parsing completed successfully in {parse_result.duration_seconds:.2f} seconds")
-        logger.info(f"Found {parse_result.total_cars_found} total unique cars")
+    except SoftTimeLimitExceeded as e:
+        if self.request.retries >= config.CRAWL_MAX_RESUMES:
+            # Raising here would keep the chord from ever calling the
+            # reducer, which fails the session and cleans up after it.
+            logger.error(f"Shard {shard} hit the soft time limit after {self.request.retries} resumes")
+            return {'shard': shard, 'error': f"soft time limit exceeded after {self.request.retries} resumes"}
+        logger.warning(f"Soft time limit reached - resuming shard {shard} from its checkpoint")
+        raise self.retry(exc=e, countdown=config.CRAWL_RESUME_DELAY, max_retries=config.CRAWL_MAX_RESUMES)
         
-        current_cars = {car['encar_id']: car for car in parse_result.new_cars}
+    except Exception as e:
+        logger.error(f"Shard {shard} failed with error: {e}", exc_info=True)
+        return {'shard': shard, 'error': str(e)}
+
+def merge_shard_results(session_id, shard_results):
+    parse_result = ParseResult(session_id=session_id)
+    errors = [f"{shard['shard']}: {shard['error']}" for shard in shard_results if shard.get('error')]
+    if errors:
+        parse_result.error_message = "; ".join(errors)
+        return parse_result
+    
+    for shard in shard_results:
+        parse_result.dead_letter_pages.extend(shard['dead_letter_pages'])
+        parse_result.incomplete_slices.extend(
+            slice_from_dict(slice_) for slice_ in shard['incomplete_slices']
+        )
+    parse_result.telemetry = {'shards': {shard['shard']: shard['telemetry'] for shard in shard_results}}
+    return parse_result
+
+@celery_app.task(bind=True, name='tasks.reduce_encar_shards')
+def reduce_encar_shards(self, shard_results, session_id):
+    logger.info(f"Reducing {len(shard_results)} shards of session {session_id}")
+    spool_dir = shard_dir(config.DATA_DIR, session_id)
+    
+    try:
+        parse_result = merge_shard_results(session_id, shard_results)
         
         with get_db_session() as db_session:
-            logger.info("Creating parse session record")
+            parse_session = db_session.query(ParseSession).filter(ParseSession.session_id == session_id).one()
+            
+            if parse_result.error_message:
+                logger.error(f"Distributed crawl failed: {parse_result.error_message}")
+                parse_session.status = 'failed'
+                parse_session.completed_at = datetime.now(timezone.utc)
+                parse_session.error_message = parse_result.error_message
+                return {
+                    'status': 'failed',
+                    'error': parse_result.error_message,
+                    'session_id': session_id
+                }
+            
+            writer, is_first_run = open_writer(db_session, parse_session)
+            for batch in read_spools(spool_dir):
+                writer.write_batch(batch)
+            
+            started_at = parse_session.started_at.replace(tzinfo=timezone.utc)
+            parse_result.total_cars_found = len(writer.seen_ids)
+            parse_result.duration_seconds = (datetime.now(timezone.utc) - started_at).total_seconds()
+            
+            complete_session(parse_session, parse_result, writer)
+            db_session.commit()
+        
+        bump_cars_generation()
+        result = {**session_summary(parse_result, writer, is_first_run), 'shards': len(shard_results)}
+        logger.info(f"Distributed crawl summary: {result}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Reducing session {session_id} failed with error: {e}", exc_info=True)
+        return {'status': 'failed', 'error': str(e), 'session_id': session_id}
+    
+    finally:
+        remove_spools(spool_dir)
+        drop_dedup(config.REDIS_URL, session_id)
+        for shard in shard_results:
+            drop_checkpoint(config.REDIS_URL, session_id, scope=shard['shard'])
+
+@celery_app.task(bind=True, name='tasks.parse_encar_delta')
+def parse_encar_delta(self):
+    logger.info("Starting Encar delta parsing task")
+    session_id = None
+    
+    try:
+        create_tables()
+        
+        with get_db_session() as db_session:
+            fail_abandoned_sessions(db_session)
+            watermark = latest_watermark(db_session)
+            if watermark is None:
+                logger.info("No modified_date watermark yet - waiting for a full crawl")
+                return {'status': 'skipped', 'reason': 'no watermark'}
+            
+            modified_since = watermark - timedelta(seconds=config.DELTA_OVERLAP_SECONDS)
+            logger.info(f"Fetching cars modified since {modified_since} (watermark {watermark})")
+            
+            parser = build_parser(strategy='delta', modified_since=modified_since)
+            parse_result = ParseResult(session_id=str(uuid.uuid4()))
+            session_id = parse_result.session_id
+            
             parse_session = ParseSession(
                 session_id=parse_result.session_id,
                 started_at=datetime.now(timezone.utc),
-                status='running'
+                status='running',
+                mode='delta'
             )
             db_session.add(parse_session)
-            db_session.flush()
+            db_session.commit()
             
-            logger.info("Checking for existing cars in database")
-            existing_cars = {car.encar_id: car for car in db_session.query(Car).filter(Car.is_active == True).all()}
-            is_first_run = len(existing_cars) == 0
+            ensure_content_hashes(db_session)
+            writer = DeltaCarWriter(db_session, parse_session, output_dir=config.DATA_DIR)
+            asyncio.run(stream_to_writer(parser, parse_result, writer))
             
-            logger.info(f"Database currently has {len(existing_cars)} active cars")
+            if parse_result.error_message:
+                logger.error(f"Delta parsing failed: {parse_result.error_message}")
+                writer.discard()
+                db_session.rollback()
+                parse_session.status = 'failed'
+                parse_session.completed_at = datetime.now(timezone.utc)
+                parse_session.error_message = parse_result.error_message
+                return {
+                    'status': 'failed',
+                    'error': parse_result.error_message,
+                    'session_id': parse_result.session_id
+                }
             
-            if is_first_run:
-                logger.info("First run detected - adding all cars as new")
-                
-                new_count = 0
-                for car_data in current_cars.values():
-                    try:
-                        car = Car(**car_data)
-                        db_session.add(car)
-                        new_count += 1
-                        
-                        if new_count % 1000 == 0:
-                            logger.info(f"Added {new_count} cars so far...")
-                            
-                    except Exception as e:
-                        logger.error(f"Failed to add car {car_data.get('encar_id')}: {e}")
-                
-                updated_count = 0
-                removed_count = 0
-                
-                logger.info(f"Added {new_count} new cars to database")
-                
-                save_json_data({
-                    'session_id': parse_result.session_id,
-                    'timestamp': datetime.now().isoformat(),
-                    'total_cars': len(current_cars),
-                    'cars': list(current_cars.values())
-                }, "current_cars.json")
-                
-            else:
-                logger.info("Incremental update - calculating differences")
-                
-                previous_cars = load_previous_cars()
-                new_cars, updated_cars, removed_car_ids = calculate_differences(current_cars, previous_cars)
-                
-                logger.info(f"Changes summary:")
-                logger.info(f"  New cars: {len(new_cars)}")
-                logger.info(f"  Updated cars: {len(updated_cars)}")
-                logger.info(f"  Removed cars: {len(removed_car_ids)}")
-                
-                logger.info("Adding new cars to database")
-                new_count = 0
-                for car_data in new_cars:
-                    try:
-                        car = Car(**car_data)
-                        db_session.add(car)
-                        new_count += 1
-                        
-                        if new_count % 100 == 0:
-                            logger.info(f"Added {new_count}/{len(new_cars)} new cars...")
-                            
-                    except Exception as e:
-                        logger.error(f"Failed to add new car {car_data.get('encar_id')}: {e}")
-                
-                logger.info("Updating existing cars in database")
-                updated_count = 0
-                for car_data in updated_cars:
-                    try:
-                        car = db_session.query(Car).filter(Car.encar_id == car_data['encar_id']).first()
-                        if car:
-                            for field, value in car_data.items():
-                                if field != 'changes' and hasattr(car, field):
-                                    setattr(car, field, value)
-                            car.last_seen_at = datetime.now(timezone.utc)
-                            updated_count += 1
-                            
-                            if updated_count % 100 == 0:
-                                logger.info(f"Updated {updated_count}/{len(updated_cars)} cars...")
-                                
-                    except Exception as e:
-                        logger.error(f"Failed to update car {car_data.get('encar_id')}: {e}")
-                
-                logger.info("Marking removed cars as inactive")
-                removed_count = 0
-                for encar_id in removed_car_ids:
-                    try:
-                        car = db_session.query(Car).filter(Car.encar_id == encar_id).first()
-                        if car and car.is_active:
-                            car.is_active = False
-                            removed_count += 1
-                            
-                            if removed_count % 100 == 0:
-                                logger.info(f"Removed {removed_count}/{len(removed_car_ids)} cars...")
-                                
-                    except Exception as e:
-                        logger.error(f"Failed to remove car {encar_id}: {e}")
-                
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                
-                if new_cars:
-                    logger.info(f"Saving {len(new_cars)} new cars to file")
-                    save_json_data({
-                        'session_id': parse_result.session_id, 
-                        'timestamp': timestamp, 
-                        'cars': new_cars
-                    }, f"new_cars_{timestamp}.json")
-                
-                if updated_cars:
-                    logger.info(f"Saving {len(updated_cars)} updated cars to file")
-                    save_json_data({
-                        'session_id': parse_result.session_id, 
-                        'timestamp': timestamp, 
-                        'cars': updated_cars
-                    }, f"updated_cars_{timestamp}.json")
-                
-                if removed_car_ids:
-                    logger.info(f"Saving {len(removed_car_ids)} removed car IDs to file")
-                    save_json_data({
-                        'session_id': parse_result.session_id, 
-                        'timestamp': timestamp, 
-                        'car_ids': list(removed_car_ids)
-                    }, f"removed_cars_{timestamp}.json")
-                
-                logger.info("Saving complete current dataset")
-                save_json_data({
-                    'session_id': parse_result.session_id,
-                    'timestamp': timestamp,
-                    'total_cars': len(current_cars),
-                    'cars': list(current_cars.values())
-                }, "current_cars.json")
+            writer.finish(parse_result)
             
-            logger.info("Updating parse session with final results")
             parse_session.completed_at = datetime.now(timezone.utc)
             parse_session.status = 'completed'
             parse_session.total_cars_found = parse_result.total_cars_found
-            parse_session.new_cars_added = new_count
-            parse_session.cars_updated = updated_count
-            parse_session.cars_removed = removed_count
-            
-            logger.info("Committing all changes to database")
+            parse_session.new_cars_added = writer.new_count
+            parse_session.cars_updated = writer.updated_count
+            parse_session.cars_removed = 0
+            parse_session.dead_letter_pages = parse_result.dead_letter_pages
+            parse_session.max_modified_date = session_watermark(parse_result, writer)
+            parse_session.telemetry = parse_result.telemetry
             db_session.commit()
         
+        bump_cars_generation()
         result = {
             'status': 'completed',
+            'mode': 'delta',
             'session_id': parse_result.session_id,
+            'modified_since': modified_since.isoformat(),
             'total_cars_found': parse_result.total_cars_found,
-            'new_cars_added': new_count,
-            'cars_updated': updated_count,
-            'cars_removed': removed_count,
+            'new_cars_added': writer.new_count,
+            'cars_updated': writer.updated_count,
             'duration_seconds': parse_result.duration_seconds,
-            'is_first_run': is_first_run
+            'dead_letter_pages': len(parse_result.dead_letter_pages),
         }
-        
-        logger.info("Task completed successfully!")
-        logger.info(f"Final summary: {result}")
-        
+        logger.info(f"Delta summary: {result}")
         return result
         
     except Exception as e:
-        logger.error(f"Task failed with error: {e}", exc_info=True)
+        logger.error(f"Delta task failed with error: {e}", exc_info=True)
+        fail_session(session_id, str(e))
+        return {'status': 'failed', 'error': str(e)}
+
+@celery_app.task(bind=True, name='tasks.rehash_content_hashes')
+def rehash_content_hashes(self):
+    logger.info("Starting content hash rehash task")
+    
+    try:
+        create_tables()
+        with get_db_session() as db_session:
+            rehashed = rehash_cars(db_session)
+        logger.info(f"Rehashed {rehashed} cars")
+        return {'status': 'completed', 'rehashed': rehashed}
+        
+    except Exception as e:
+        logger.error(f"Rehash task failed with error: {e}", exc_info=True)
         return {'status': 'failed', 'error': str(e)}
 
 @celery_app.task(name='tasks.test_task')
@@ -0,0 +1,143 @@
+import bisect
+import logging
+from collections import Counter
+from dataclasses import asdict, dataclass
+
+logger = logging.getLogger(__name__)
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+if prometheus_client is not None:
+    REQUEST_SECONDS = prometheus_client.Histogram(
+        "encar_request_seconds", "Latency of Encar search requests", buckets=LATENCY_BUCKETS
+    )
+    RESPONSES = prometheus_client.Counter(
+        "encar_responses", "Encar search responses by HTTP status", ["status"]
+    )
+    RESPONSE_BYTES = prometheus_client.Counter(
+        "encar_response_bytes", "Bytes downloaded from the Encar search API"
+    )
+    # Labelled by sort order rather than configuration: partition configs
+    # are named after their slices, which would grow the label set with
+    # every crawl. Per-config numbers are kept in the ``summary``.
+    SORT_PAGES = prometheus_client.Counter(
+        "encar_sort_pages", "Pages fetched per sort order", ["sort"]
+    )
+    SORT_CARS = prometheus_client.Counter(
+        "encar_sort_cars", "Unique cars contributed per sort order", ["sort"]
+    )
+    QUEUE_DEPTH = prometheus_client.Gauge(
+        "encar_batch_queue_depth", "Batches waiting for the writer stage"
+    )
+    UNIQUE_CARS = prometheus_client.Gauge(
+        "encar_crawl_unique_cars", "Unique cars found by the running crawl"
+    )
+
+_server_port = None
+
+
+def start_metrics_server(port):
+    """Serves the Prometheus metrics of this process on ``port``, once."""
+    global _server_port
+    if not port or _server_port is not None:
+        return
+    if prometheus_client is None:
+        logger.warning("prometheus_client is not installed, metrics endpoint disabled")
+        return
+    try:
+        prometheus_client.start_http_server(port)
+    except OSError as e:
+        logger.warning(f"Failed to start metrics endpoint on port {port}: {e}")
+        return
+    _server_port = port
+    logger.info(f"Serving crawl metrics on port {port}")
+
+
+@dataclass
+class ConfigTelemetry:
+    pages: int = 0
+    listings: int = 0
+    cars: int = 0
+
+
+class CrawlTelemetry:
+    """Request and yield statistics of one crawl.
+
+    Everything recorded here is mirrored to the process-wide Prometheus
+    metrics when ``prometheus_client`` is installed; ``summary`` returns the
+    numbers of this crawl alone, for storing on its ``ParseSession``.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+        self.statuses = Counter()
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.queue_depth_max = 0
+        self.configs = {}
+
+    def record_response(self, status, elapsed, size=0):
+        self.requests += 1
+        self.bytes += size
+        self.statuses[str(status or "error")] += 1
+        self.latency_counts[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        self.latency_sum += elapsed
+        self.latency_max = max(self.latency_max, elapsed)
+        if prometheus_client is not None:
+            REQUEST_SECONDS.observe(elapsed)
+            RESPONSES.labels(str(status or "error")).inc()
+            RESPONSE_BYTES.inc(size)
+
+    def record_page(self, config_name, sort_option, listings, cars):
+        stats = self.configs.setdefault(config_name, ConfigTelemetry())
+        stats.pages += 1
+        stats.listings += listings
+        stats.cars += cars
+        if prometheus_client is not None:
+            SORT_PAGES.labels(sort_option).inc()
+            SORT_CARS.labels(sort_option).inc(cars)
+
+    def record_queue_depth(self, depth):
+        self.queue_depth_max = max(self.queue_depth_max, depth)
+        if prometheus_client is not None:
+            QUEUE_DEPTH.set(depth)
+
+    def record_unique_cars(self, count):
+        if prometheus_client is not None:
+            UNIQUE_CARS.set(count)
+
+    def latency_quantile(self, q):
+        """Upper bound of the histogram bucket holding the ``q`` quantile."""
+        if not self.requests:
+            return None
+        target = q * self.requests
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.latency_counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.latency_max
+
+    def summary(self):
+        return {
+            "requests": self.requests,
+            "bytes": self.bytes,
+            "statuses": dict(self.statuses),
+            "latency": {
+                "mean": self.latency_sum / self.requests if self.requests else None,
+                "p50": self.latency_quantile(0.5),
+                "p95": self.latency_quantile(0.95),
+                "max": self.latency_max,
+                "buckets": dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"], self.latency_counts)),
+            },
+            "queue_depth_max": self.queue_depth_max,
+            "configs": {name: asdict(stats) for name, stats in self.configs.items()},
+        }
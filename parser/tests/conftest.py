@@ -0,0 +1,39 @@
+import os
+
+import fakeredis
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import ensure_history_partitions
+from ingest import STAGING
+from models import Base
+
+# Tests that need Postgres run against this database, which they drop and
+# recreate all tables in.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture
+def fake_redis():
+    """Factory of async Redis clients sharing one in-memory server."""
+    server = fakeredis.FakeServer()
+    return lambda: fakeredis.aioredis.FakeRedis(server=server)
+
+
+@pytest.fixture
+def db_session():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(TEST_DATABASE_URL)
+    with engine.begin() as connection:
+        STAGING.drop(connection, checkfirst=True)
+        Base.metadata.drop_all(connection)
+        Base.metadata.create_all(connection)
+        ensure_history_partitions(connection)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
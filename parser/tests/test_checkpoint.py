@@ -0,0 +1,95 @@
+import asyncio
+
+from checkpoint import CrawlCheckpoint, checkpoint_keys
+from parser import CrawlConfig, EncarParser, config_from_dict
+from partitioner import Slice
+from records import normalize_car
+from scheduler import ConfigState
+
+
+def listing(car_id, modified_date="2025-03-01 10:20:30.000 +09"):
+    return {"Id": car_id, "Manufacturer": "기아", "Price": 2500, "Year": 202101, "ModifiedDate": modified_date}
+
+
+def config_state(name, index=0, total_count=None, max_pages=10, stopped=False):
+    crawl_config = CrawlConfig(f"q={name}", name, "ModifiedDate", 500)
+    return ConfigState(crawl_config, index, max_pages, total_count=total_count, stopped=stopped)
+
+
+def config_name(name):
+    return config_state(name).config.name
+
+
+def checkpoint(fake_redis, ttl=60):
+    crawl_checkpoint = CrawlCheckpoint("redis://localhost", "session", ttl=ttl)
+    crawl_checkpoint.client = fake_redis()
+    return crawl_checkpoint
+
+
+async def restore(crawl_checkpoint):
+    progress = {}
+    batches = [batch async for batch in crawl_checkpoint.restore(progress)]
+    return progress, batches
+
+
+def test_restore_replays_cars_and_pages_done_per_config(fake_redis):
+    first = [normalize_car(listing(1)), normalize_car(listing(2, None))]
+    second = [normalize_car(listing(3))]
+
+    async def run():
+        crawl_checkpoint = checkpoint(fake_redis)
+        await crawl_checkpoint.record_page(config_state("a", total_count=1200, max_pages=3), 0, first)
+        await crawl_checkpoint.record_page(config_state("b", index=1, stopped=True), 0, [])
+        await crawl_checkpoint.record_page(config_state("a", total_count=1200, max_pages=3), 2, second)
+        return await restore(crawl_checkpoint)
+
+    progress, batches = asyncio.run(run())
+
+    # JSON turns the tuple defaults into lists, so compare the scalar fields.
+    def scalars(batch):
+        return [(car.encar_id, car.manufacturer, car.price, car.year, car.modified_date) for car in batch]
+
+    assert [scalars(batch) for batch in batches] == [scalars(first), scalars(second)]
+    a, b = progress[config_name("a")], progress[config_name("b")]
+    assert (a.pages, a.total_count, a.max_pages, a.stopped) == ({0, 2}, 1200, 3, False)
+    assert (b.pages, b.stopped) == ({0}, True)
+
+
+def test_resumed_state_skips_checkpointed_pages(fake_redis):
+    async def run():
+        crawl_checkpoint = checkpoint(fake_redis)
+        await crawl_checkpoint.record_page(config_state("a", total_count=1200, max_pages=3), 1, [])
+        return await restore(crawl_checkpoint)
+
+    progress, _ = asyncio.run(run())
+    state = config_state("a")
+    EncarParser.resume_state(state, progress[config_name("a")])
+
+    assert state.done_pages == {1}
+    assert (state.total_count, state.max_pages) == (1200, 3)
+
+
+def test_plan_round_trips_partition_configs(fake_redis):
+    configs = [
+        CrawlConfig("q=x", "root_BMW", "PriceAsc", 500, partition=Slice("root", ("Hidden.N",), manufacturer="BMW")),
+        CrawlConfig("q=y", "root_Y2000-2010", "ModifiedDate", 500, max_pages=4,
+                    partition=Slice("root", ("Hidden.N",), years=(2000, 2010))),
+    ]
+
+    async def run():
+        crawl_checkpoint = checkpoint(fake_redis)
+        assert await crawl_checkpoint.load_plan() is None
+        await crawl_checkpoint.save_plan(configs)
+        return await crawl_checkpoint.load_plan()
+
+    assert [config_from_dict(data) for data in asyncio.run(run())] == configs
+
+
+def test_checkpoint_keys_expire(fake_redis):
+    async def run():
+        crawl_checkpoint = checkpoint(fake_redis, ttl=60)
+        await crawl_checkpoint.save_plan([])
+        await crawl_checkpoint.record_page(config_state("a"), 0, [])
+        return [await crawl_checkpoint.client.ttl(key) for key in checkpoint_keys("session", "full")]
+
+    assert all(0 < ttl <= 60 for ttl in asyncio.run(run()))
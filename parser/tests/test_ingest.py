@@ -0,0 +1,194 @@
+import uuid
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+import ingest
+from config import config
+from ingest import CarWriter
+from models import Car, CarHistory, ParseSession
+from parser import ParseResult
+from partitioner import Slice
+from records import normalize_car
+
+
+def car(encar_id, price=2500, **fields):
+    listing = {"Id": encar_id, "Manufacturer": "기아", "Model": "K5", "Price": price, "Year": 202101}
+    listing.update(fields)
+    return normalize_car(listing)
+
+
+def crawl(db_session, tmp_path, cars, is_first_run=False, parse_result=None):
+    """Runs one full crawl of ``cars`` through a ``CarWriter`` and completes
+    its session."""
+    parse_session = ParseSession(session_id=str(uuid.uuid4()), status="running")
+    db_session.add(parse_session)
+    db_session.commit()
+
+    writer = CarWriter(db_session, parse_session, is_first_run, output_dir=tmp_path)
+    writer.write_batch(cars)
+    writer.finish(parse_result or ParseResult(session_id=parse_session.session_id))
+    parse_session.status = "completed"
+    db_session.commit()
+    return writer
+
+
+def stored(db_session, encar_id):
+    db_session.expire_all()
+    return db_session.scalars(select(Car).where(Car.encar_id == encar_id)).one()
+
+
+def history(db_session, encar_id):
+    return db_session.scalars(
+        select(CarHistory).where(CarHistory.encar_id == encar_id).order_by(CarHistory.id)
+    ).all()
+
+
+def test_first_run_inserts_every_car(db_session, tmp_path):
+    writer = crawl(db_session, tmp_path, [car(1), car(2), car(2)], is_first_run=True)
+
+    assert writer.new_count == 2
+    assert db_session.query(Car).count() == 2
+    assert stored(db_session, "1").content_hash
+
+
+def test_unchanged_car_is_not_rewritten(db_session, tmp_path):
+    crawl(db_session, tmp_path, [car(1)], is_first_run=True)
+    first = stored(db_session, "1")
+    updated_at = first.updated_at
+
+    writer = crawl(db_session, tmp_path, [car(1)])
+
+    assert writer.updated_count == 0
+    assert stored(db_session, "1").updated_at == updated_at
+
+
+def test_changed_car_is_updated(db_session, tmp_path):
+    crawl(db_session, tmp_path, [car(1), car(2)], is_first_run=True)
+    updated_at = stored(db_session, "1").updated_at
+
+    writer = crawl(db_session, tmp_path, [car(1, price=2300), car(2)])
+
+    assert writer.updated_count == 1
+    updated = stored(db_session, "1")
+    assert updated.price == 2300
+    assert updated.updated_at > updated_at
+
+
+def test_inactive_car_is_reactivated_when_seen_again(db_session, tmp_path):
+    crawl(db_session, tmp_path, [car(1)], is_first_run=True)
+    stored(db_session, "1").is_active = False
+    db_session.commit()
+
+    writer = crawl(db_session, tmp_path, [car(1)])
+
+    assert writer.updated_count == 1
+    assert stored(db_session, "1").is_active
+
+
+def test_history_records_new_and_updated_cars(db_session, tmp_path):
+    crawl(db_session, tmp_path, [car(1), car(2)], is_first_run=True)
+    writer = crawl(db_session, tmp_path, [car(1, price=2300), car(2), car(3)])
+
+    assert [(row.event, row.price) for row in history(db_session, "1")] == [("new", 2500), ("updated", 2300)]
+    assert [row.event for row in history(db_session, "2")] == ["new"]
+    assert [row.event for row in history(db_session, "3")] == ["new"]
+    assert history(db_session, "1")[-1].session_id == writer.session_id
+    assert history(db_session, "1")[0].car_id == stored(db_session, "1").id
+
+
+def test_missing_car_is_deactivated_after_grace_sessions(db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "REMOVAL_GRACE_SESSIONS", 2)
+    crawl(db_session, tmp_path, [car(1), car(2)], is_first_run=True)
+
+    writer = crawl(db_session, tmp_path, [car(2)])
+    missed = stored(db_session, "1")
+    assert writer.removed_count == 0
+    assert (missed.is_active, missed.missed_sessions) == (True, 1)
+
+    writer = crawl(db_session, tmp_path, [car(2)])
+    removed = stored(db_session, "1")
+    assert writer.removed_count == 1
+    assert (removed.is_active, removed.missed_sessions) == (False, 2)
+    assert [row.event for row in history(db_session, "1")] == ["new", "removed"]
+    assert stored(db_session, "2").is_active
+
+
+def test_seen_car_resets_missed_sessions(db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "REMOVAL_GRACE_SESSIONS", 2)
+    crawl(db_session, tmp_path, [car(1), car(2)], is_first_run=True)
+    crawl(db_session, tmp_path, [car(2)])
+    last_seen_at = stored(db_session, "1").last_seen_at
+
+    writer = crawl(db_session, tmp_path, [car(1), car(2)])
+
+    seen = stored(db_session, "1")
+    assert writer.updated_count == 0
+    assert (seen.is_active, seen.missed_sessions) == (True, 0)
+    assert seen.last_seen_at > last_seen_at
+
+
+def test_incomplete_slice_keeps_its_missing_cars_active(db_session, tmp_path):
+    crawl(db_session, tmp_path, [car(1), car(2, Manufacturer="현대")], is_first_run=True)
+    parse_result = ParseResult(session_id="", incomplete_slices=[Slice("root", (), manufacturer="기아")])
+
+    writer = crawl(db_session, tmp_path, [], parse_result=parse_result)
+
+    assert writer.removed_count == 1
+    assert stored(db_session, "1").is_active
+    assert not stored(db_session, "2").is_active
+
+
+def fail_on_call(monkeypatch, call, error):
+    """Makes the ``call``-th chunk applied by any ``CarWriter`` raise ``error``."""
+    apply_chunk = CarWriter._apply_chunk
+    calls = []
+
+    def failing(self, in_chunk):
+        calls.append(in_chunk)
+        if len(calls) == call:
+            raise error
+        return apply_chunk(self, in_chunk)
+
+    monkeypatch.setattr(CarWriter, "_apply_chunk", failing)
+    return calls
+
+
+def test_interrupted_ingest_resumes_after_the_last_chunk(db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "INGEST_CHUNK_SIZE", 2)
+    cars = [car(encar_id) for encar_id in range(1, 6)]
+    parse_session = ParseSession(session_id=str(uuid.uuid4()), status="running")
+    db_session.add(parse_session)
+    db_session.commit()
+    calls = fail_on_call(monkeypatch, 2, RuntimeError("worker lost"))
+
+    writer = CarWriter(db_session, parse_session, False, output_dir=tmp_path)
+    writer.write_batch(cars)
+    with pytest.raises(RuntimeError):
+        writer.finish(ParseResult(session_id=parse_session.session_id))
+    db_session.rollback()
+    assert (parse_session.ingest_stage, parse_session.ingest_chunks) == ("applying", 1)
+
+    writer = CarWriter(db_session, parse_session, False, output_dir=tmp_path)
+    writer.write_batch(cars)
+    writer.finish(ParseResult(session_id=parse_session.session_id))
+    db_session.commit()
+
+    # Only the chunks after the committed one are applied again.
+    assert len(calls) == 4
+    assert writer.new_count == 5
+    assert db_session.query(Car).count() == 5
+    assert db_session.query(CarHistory).filter(CarHistory.event == "new").count() == 5
+    assert parse_session.ingest_stage == "done"
+
+
+def test_chunk_is_retried_after_an_operational_error(db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest.time, "sleep", lambda delay: None)
+    calls = fail_on_call(monkeypatch, 1, OperationalError("UPDATE cars", {}, Exception("deadlock detected")))
+
+    writer = crawl(db_session, tmp_path, [car(1), car(2)])
+
+    assert len(calls) == 2
+    assert writer.new_count == 2
+    assert db_session.query(CarHistory).count() == 2
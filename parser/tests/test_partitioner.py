@@ -0,0 +1,108 @@
+import asyncio
+import re
+
+from partitioner import FacetPartitioner, Slice
+
+ROOT = Slice("root", ("Hidden.N", "CarType.Y"))
+
+
+class FakeApi:
+    """Answers count requests from an in-memory list of cars.
+
+    ``overrides`` maps slice names to the count reported for them instead,
+    standing in for listings that change between count requests.
+    """
+
+    def __init__(self, cars, overrides=None):
+        self.cars = cars
+        self.overrides = overrides or {}
+
+    async def search_premium_async(self, session, offset, count, sort, query):
+        slice_ = self.parse(query)
+        if slice_.name in self.overrides:
+            total = self.overrides[slice_.name]
+        else:
+            total = sum(1 for car in self.cars if slice_.matches(car))
+        return {"Count": total}, None, None, None, None
+
+    @staticmethod
+    def parse(query):
+        manufacturer = re.search(r"Manufacturer\.([^.]+)\.", query)
+        years = re.search(r"Year\.range\((\d+)00\.\.(\d+)99\)", query)
+        prices = re.search(r"Price\.range\((\d+)\.\.(\d+)\)", query)
+        return Slice(
+            ROOT.root_name,
+            ROOT.base_terms,
+            manufacturer=manufacturer.group(1) if manufacturer else None,
+            years=tuple(map(int, years.groups())) if years else None,
+            prices=tuple(map(int, prices.groups())) if prices else None,
+        )
+
+
+def cars(count, manufacturer="A", year=2001, price=1000):
+    return [{"manufacturer": manufacturer, "year": year * 100 + 1, "price": price}] * count
+
+
+def partition(api, **kwargs):
+    kwargs.setdefault("year_bounds", (2000, 2010))
+    kwargs.setdefault("price_bounds", (0, 2000))
+    partitioner = FacetPartitioner(api, retry_backoff=0, **kwargs)
+    return {slice_.name: count for slice_, count in asyncio.run(partitioner.partition(None, [ROOT]))}
+
+
+def test_slice_within_window_is_not_split():
+    api = FakeApi(cars(5))
+
+    assert partition(api, window=10, manufacturers=["A"]) == {"root": 5}
+
+
+def test_manufacturer_split_is_accepted_when_brands_cover_the_parent():
+    api = FakeApi(cars(2, "A", 2001) + cars(1, "A", 2008) + cars(1, "B"))
+
+    leaves = partition(api, window=2, manufacturers=["A", "B"])
+
+    assert leaves == {"root_A_Y2000-2005": 2, "root_A_Y2006-2010": 1, "root_B": 1}
+
+
+def test_manufacturer_split_missing_a_brand_falls_back_to_year_bands():
+    api = FakeApi(cars(3, "A", 2001) + cars(2, "Unlisted", 2008))
+
+    leaves = partition(api, window=3, manufacturers=["A"])
+
+    assert leaves == {"root_Y2000-2005": 3, "root_Y2006-2010": 2}
+
+
+def test_range_split_above_the_parent_count_is_accepted():
+    api = FakeApi(cars(50, year=2001) + cars(49, year=2008), overrides={"root": 95})
+
+    leaves = partition(api, window=60, manufacturers=[])
+
+    assert leaves == {"root_Y2000-2005": 50, "root_Y2006-2010": 49}
+
+
+def test_range_split_short_of_the_parent_count_keeps_slice_as_overflow():
+    api = FakeApi(cars(50, year=2001) + cars(49, year=2008), overrides={"root": 100})
+
+    leaves = partition(api, window=60, manufacturers=[])
+
+    assert leaves == {"root": 100}
+
+
+def test_year_split_short_of_the_parent_count_falls_back_to_price_bands():
+    # Listings without a year are missing from every year band.
+    api = FakeApi(
+        cars(3, year=2001, price=100) + cars(2, year=2008, price=1900),
+        overrides={"root_Y2006-2010": 0},
+    )
+
+    leaves = partition(api, window=3, manufacturers=[])
+
+    assert leaves == {"root_P0-1000": 3, "root_P1001-2000": 2}
+
+
+def test_single_year_is_split_by_price():
+    api = FakeApi(cars(3, year=2004, price=100) + cars(2, year=2004, price=1900))
+
+    leaves = partition(api, window=3, manufacturers=[], year_bounds=(2004, 2004))
+
+    assert leaves == {"root_P0-1000": 3, "root_P1001-2000": 2}
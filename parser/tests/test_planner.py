@@ -0,0 +1,87 @@
+import json
+
+from planner import CrawlPlanner
+
+
+def ids(*numbers):
+    return [str(number) for number in numbers]
+
+
+def test_config_stops_after_patience_low_yield_pages():
+    planner = CrawlPlanner(min_page_yield=0.5, low_yield_patience=2)
+    planner.record_page("a", ids(1, 2, 3, 4))
+
+    planner.record_page("a", ids(1, 2, 3, 5))
+    assert planner.should_continue("a")
+
+    planner.record_page("a", ids(1, 2, 3, 4))
+    assert not planner.should_continue("a")
+
+
+def test_productive_page_resets_low_yield_count():
+    planner = CrawlPlanner(min_page_yield=0.5, low_yield_patience=2)
+    planner.record_page("a", ids(1, 2, 3, 4))
+    planner.record_page("a", ids(1, 2, 3, 4))
+    planner.record_page("a", ids(5, 6, 7, 8))
+    planner.record_page("a", ids(5, 6, 7, 8))
+
+    assert planner.should_continue("a")
+    assert planner.stats["a"].low_yield_pages == 1
+
+
+def test_record_page_returns_only_unseen_ids():
+    planner = CrawlPlanner()
+    planner.record_page("a", ids(1, 2))
+
+    assert planner.record_page("b", ["2", "3", None]) == {"3"}
+    assert planner.seen_ids == {"1", "2", "3"}
+
+
+def test_coverage_flattens_once_recent_configs_add_little():
+    planner = CrawlPlanner(coverage_window=2, coverage_epsilon=0.1)
+    planner.record_page("a", ids(*range(100)))
+    planner.finish_config("a")
+    planner.record_page("b", ids(100, 101, 102, 103, 104, 105))
+    planner.finish_config("b")
+    assert not planner.coverage_flattened()
+
+    planner.record_page("c", ids(106))
+    planner.finish_config("c")
+    planner.finish_config("d")
+    assert planner.coverage_flattened()
+
+
+def test_coverage_needs_a_full_window_of_configs():
+    planner = CrawlPlanner(coverage_window=3, coverage_epsilon=0.5)
+    planner.record_page("a", ids(1))
+    planner.finish_config("a")
+    planner.finish_config("b")
+
+    assert not planner.coverage_flattened()
+
+
+def test_plan_orders_configs_by_previous_yield(tmp_path):
+    history_path = tmp_path / "plan.json"
+    history_path.write_text(json.dumps({
+        "slow": {"new_per_page": 2.0},
+        "fast": {"new_per_page": 40.0},
+        "dead": {"new_per_page": 0.1},
+    }))
+    planner = CrawlPlanner(min_config_yield=1.0, history_path=history_path)
+
+    plan = planner.plan(["dead", "new", "slow", "fast"], lambda name: name)
+
+    assert plan == ["fast", "slow", "new", "dead"]
+
+
+def test_save_history_keeps_entries_written_by_other_shards(tmp_path):
+    history_path = tmp_path / "plan.json"
+    planner = CrawlPlanner(history_path=history_path)
+    history_path.write_text(json.dumps({"other": {"new_per_page": 3.0}}))
+    planner.record_page("mine", ids(1, 2))
+
+    planner.save_history()
+
+    history = json.loads(history_path.read_text())
+    assert set(history) == {"other", "mine"}
+    assert history["mine"]["new_per_page"] == 2.0
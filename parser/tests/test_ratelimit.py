@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+
+from ratelimit import AdaptiveThrottle, AIMDController, TokenBucket, backoff_delay
+
+
+def test_limit_grows_by_one_after_a_window_of_successes():
+    controller = AIMDController(4, 6)
+
+    for _ in range(3):
+        controller.on_success(0.1)
+    assert controller.limit == 4
+    controller.on_success(0.1)
+    assert controller.limit == 5
+
+
+def test_limit_never_exceeds_maximum():
+    controller = AIMDController(6, 6)
+
+    for _ in range(50):
+        controller.on_success(0.1)
+
+    assert controller.limit == 6
+
+
+def test_congestion_cuts_limit_once_per_cooldown():
+    controller = AIMDController(8, 8, decrease_factor=0.5, cooldown=60)
+
+    assert controller.on_congestion("HTTP 429")
+    assert not controller.on_congestion("HTTP 429")
+    assert controller.limit == 4
+
+
+def test_congestion_respects_minimum():
+    controller = AIMDController(2, 8, minimum=2, cooldown=0)
+
+    controller.on_congestion("HTTP 503")
+
+    assert controller.limit == 2
+
+
+def test_high_p95_latency_counts_as_congestion():
+    controller = AIMDController(8, 8, latency_target=1.0, latency_window=10, cooldown=0)
+
+    for _ in range(4):
+        controller.on_success(3.0)
+    assert controller.limit == 8
+    controller.on_success(3.0)
+
+    assert controller.limit == 4
+    assert not controller.latencies
+
+
+def test_acquire_waits_for_a_free_slot():
+    async def run():
+        controller = AIMDController(1, 1)
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        await controller.release()
+        await asyncio.wait_for(waiter, timeout=1)
+        assert controller.in_flight == 1
+
+    asyncio.run(run())
+
+
+def test_token_bucket_spaces_acquires_by_rate():
+    async def run():
+        bucket = TokenBucket(rate=50, burst=1)
+        started = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 4 / 50 * 0.9
+
+
+def test_token_bucket_pause_holds_acquires():
+    async def run():
+        bucket = TokenBucket(rate=1000)
+        bucket.pause(0.05)
+        started = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.04
+
+
+def test_throttle_backs_off_on_throttling_and_recovers():
+    throttle = AdaptiveThrottle(max_concurrent=8, request_delay=0.1)
+
+    throttle.record(429, 0.2, retry_after=0.5)
+    assert throttle.concurrency.limit == 4
+    assert throttle.bucket.rate == pytest.approx(5.0)
+    assert throttle.bucket.paused_until > time.monotonic()
+
+    for _ in range(100):
+        throttle.record(200, 0.2)
+    assert throttle.bucket.rate == pytest.approx(10.0)
+    assert throttle.concurrency.limit == 8
+
+
+def test_client_errors_do_not_throttle():
+    throttle = AdaptiveThrottle(max_concurrent=8, request_delay=0.1)
+
+    throttle.record(404, 0.2)
+
+    assert throttle.concurrency.limit == 8
+    assert throttle.bucket.rate == pytest.approx(10.0)
+
+
+def test_backoff_delay_is_capped_and_jittered():
+    for attempt in range(10):
+        delay = backoff_delay(attempt, base=1.0, maximum=8.0)
+        expected = min(8.0, 2 ** attempt)
+        assert expected / 2 <= delay <= expected
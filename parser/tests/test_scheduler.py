@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from scheduler import ConfigState, PageScheduler
+
+
+class Fatal(Exception):
+    pass
+
+
+def run_scheduler(states, process_page, **kwargs):
+    finished = []
+    dead_letters = []
+    scheduler = PageScheduler(
+        process_page,
+        workers=3,
+        on_finish=finished.append,
+        on_dead_letter=lambda state, page, error: dead_letters.append((state.index, page, str(error))),
+        backoff_base=0.001,
+        backoff_max=0.001,
+        **kwargs,
+    )
+    asyncio.run(scheduler.run(states))
+    return finished, dead_letters
+
+
+def counting_pages(total_count=50, fail=None):
+    """process_page that records every call and raises for pages in
+    ``fail`` while their remaining failure count is positive."""
+    calls = []
+    fail = dict(fail or {})
+
+    async def process_page(state, page):
+        calls.append((state.index, page))
+        state.total_count = total_count
+        if fail.get(page, 0) > 0:
+            fail[page] -= 1
+            raise RuntimeError(f"page {page} failed")
+
+    return process_page, calls
+
+
+def test_runs_every_page_of_every_config():
+    states = [ConfigState(None, index, max_pages=4) for index in range(3)]
+    process_page, calls = counting_pages()
+
+    finished, dead_letters = run_scheduler(states, process_page)
+
+    assert sorted(calls) == [(index, page) for index in range(3) for page in range(4)]
+    assert sorted(state.index for state in finished) == [0, 1, 2]
+    assert dead_letters == []
+    assert all(state.finished and state.in_flight == 0 for state in states)
+
+
+def test_failed_page_is_retried_until_it_succeeds():
+    state = ConfigState(None, 0, max_pages=3)
+    process_page, calls = counting_pages(fail={1: 2})
+
+    finished, dead_letters = run_scheduler([state], process_page, max_attempts=4)
+
+    assert calls.count((0, 1)) == 3
+    assert sorted(set(calls)) == [(0, 0), (0, 1), (0, 2)]
+    assert dead_letters == []
+    assert finished == [state]
+
+
+def test_page_is_dead_lettered_after_max_attempts():
+    state = ConfigState(None, 0, max_pages=3)
+    process_page, calls = counting_pages(fail={2: 10})
+
+    finished, dead_letters = run_scheduler([state], process_page, max_attempts=3)
+
+    assert calls.count((0, 2)) == 3
+    assert dead_letters == [(0, 2, "page 2 failed")]
+    assert finished == [state]
+    assert state.in_flight == 0
+
+
+def test_done_pages_are_not_fetched_again():
+    state = ConfigState(None, 0, max_pages=5, total_count=50, done_pages={0, 2, 3})
+    process_page, calls = counting_pages()
+
+    finished, _ = run_scheduler([state], process_page)
+
+    assert sorted(calls) == [(0, 1), (0, 4)]
+    assert finished == [state]
+
+
+def test_config_with_every_page_done_finishes_without_fetching():
+    done = ConfigState(None, 0, max_pages=2, total_count=20, done_pages={0, 1})
+    pending = ConfigState(None, 1, max_pages=2)
+    process_page, calls = counting_pages()
+
+    finished, _ = run_scheduler([done, pending], process_page)
+
+    assert sorted(calls) == [(1, 0), (1, 1)]
+    assert done in finished and pending in finished
+
+
+def test_fatal_exception_stops_the_run_without_retrying():
+    state = ConfigState(None, 0, max_pages=10)
+    calls = []
+
+    async def process_page(state, page):
+        calls.append(page)
+        state.total_count = 100
+        if page == 1:
+            raise Fatal()
+
+    with pytest.raises(Fatal):
+        run_scheduler([state], process_page, fatal_exceptions=(Fatal,), max_attempts=4)
+
+    assert calls.count(1) == 1
+
+
+def test_failing_dead_letter_callback_does_not_stall_the_run():
+    state = ConfigState(None, 0, max_pages=3)
+    process_page, calls = counting_pages(fail={0: 10})
+
+    def on_dead_letter(state, page, error):
+        raise RuntimeError("dead letter store unavailable")
+
+    scheduler = PageScheduler(process_page, workers=1, on_dead_letter=on_dead_letter, max_attempts=2, backoff_base=0.001)
+    asyncio.run(asyncio.wait_for(scheduler.run([state]), timeout=5))
+
+    assert sorted(set(calls)) == [(0, 0), (0, 1), (0, 2)]
+    assert state.finished
@@ -0,0 +1,45 @@
+import asyncio
+
+from sharding import RedisDedup, dedup_key
+
+
+def dedup(fake_redis, owner, ttl=60):
+    shard_dedup = RedisDedup("redis://localhost", "session", owner, ttl=ttl)
+    shard_dedup.client = fake_redis()
+    return shard_dedup
+
+
+def test_each_id_goes_to_the_first_shard_claiming_it(fake_redis):
+    async def run():
+        first, second = dedup(fake_redis, "A"), dedup(fake_redis, "B")
+        return await first.claim(["1", "2", "3"]), await second.claim(["2", "3", "4"])
+
+    assert asyncio.run(run()) == ({"1", "2", "3"}, {"4"})
+
+
+def test_claiming_again_returns_the_ids_already_held(fake_redis):
+    async def run():
+        first, second = dedup(fake_redis, "A"), dedup(fake_redis, "B")
+        await first.claim(["1", "2"])
+        await second.claim(["3"])
+        return await first.claim(["1", "2", "3", "5"])
+
+    assert asyncio.run(run()) == {"1", "2", "5"}
+
+
+def test_claim_sets_the_session_ttl(fake_redis):
+    async def run():
+        shard_dedup = dedup(fake_redis, "A", ttl=60)
+        await shard_dedup.claim(["1"])
+        return await shard_dedup.client.ttl(dedup_key("session"))
+
+    assert 0 < asyncio.run(run()) <= 60
+
+
+def test_empty_claim_does_not_touch_redis(fake_redis):
+    async def run():
+        shard_dedup = dedup(fake_redis, "A")
+        claimed = await shard_dedup.claim([])
+        return claimed, await shard_dedup.client.exists(dedup_key("session"))
+
+    assert asyncio.run(run()) == (set(), 0)